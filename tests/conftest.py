@@ -34,6 +34,7 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
 )
 
 pytest_plugins = [
+    'tests.fixtures.fixture_cache',
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def testing_environment():
+    from core.runner import testing_environment
+
+    with testing_environment():
+        yield
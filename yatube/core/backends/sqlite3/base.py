@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+# Настройки бэкенда, а не аргументы sqlite3.connect().
+OWN_OPTIONS = ('pragmas', 'transaction_mode')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite с PRAGMA из OPTIONS['pragmas'] на каждом новом соединении.
+    OPTIONS['transaction_mode'] задаёт, как atomic начинает транзакцию:
+    при IMMEDIATE блокировка на запись берётся сразу и ждёт timeout, а
+    не падает с «database is locked», когда транзакция, начавшаяся с
+    чтения, пытается писать.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in OWN_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode', '')
+        self.cursor().execute(f'BEGIN {mode}'.strip())
@@ -0,0 +1,408 @@
+import copy
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Запись журнала, после которой процессы очищают локальный уровень целиком.
+CLEAR = '*'
+# SQLite принимает не больше 999 параметров в запросе.
+CHUNK_SIZE = 900
+BUSY_TIMEOUT = 5
+METRICS = (
+    'local_hits', 'shared_hits', 'misses', 'sets', 'deletes',
+    'evictions', 'invalidations',
+)
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS invalidations ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL)',
+)
+
+# Django создаёт экземпляр кэша на каждый поток, а локальный уровень
+# должен быть общим для потоков процесса.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def isolated_caches(directory):
+    """
+    Копия CACHES, в которой файлы TieredCache лежат в directory: тесты
+    и замеры не должны видеть общий кэш воркеров.
+    """
+    caches = copy.deepcopy(settings.CACHES)
+    for alias, options in caches.items():
+        if options['BACKEND'] == f'{__name__}.TieredCache':
+            options['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+    return caches
+
+
+def expired(expires, now):
+    return expires is not None and expires <= now
+
+
+class LocalTier:
+    """
+    LRU одного процесса: ключ -> (срок, pickle значения). generation
+    растёт при каждой записи и сбросе: значение, прочитанное из общего
+    хранилища до них, в LRU уже не кладём.
+    """
+
+    def __init__(self, max_entries):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.generation = 0
+        self.seen = None
+        self.synced = 0.0
+        self.own = set()
+        self.writes = 0
+        self.stats = dict.fromkeys(METRICS, 0)
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+
+class TieredCache(BaseCache):
+    """
+    Двухуровневый кэш: небольшой LRU в памяти процесса перед общим для
+    всех воркеров хранилищем в файле SQLite (LOCATION). Каждая запись
+    попадает в журнал invalidations; процессы читают его не чаще раза
+    в SYNC_INTERVAL секунд и выбрасывают из своего LRU изменённые
+    другими ключи, так что чужие изменения видны с задержкой не больше
+    SYNC_INTERVAL, а свои — сразу.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 0.25))
+        self.log_size = int(options.get('LOG_SIZE', 10000))
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self._connection = None
+        self._pid = None
+
+    @property
+    def tier(self):
+        key = (self.location, os.getpid())
+        tier = _tiers.get(key)
+        if tier is None:
+            with _tiers_lock:
+                tier = _tiers.setdefault(
+                    key, LocalTier(self.local_max_entries)
+                )
+        return tier
+
+    def connection(self):
+        # После fork соединение родителя использовать нельзя.
+        if self._pid != os.getpid():
+            db = sqlite3.connect(
+                self.location, timeout=BUSY_TIMEOUT, isolation_level=None
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._connection, self._pid = db, os.getpid()
+        return self._connection
+
+    def sync(self):
+        """Применяет к LRU чужие записи из журнала."""
+        tier = self.tier
+        now = time.monotonic()
+        with tier.lock:
+            if tier.seen is not None and (
+                now - tier.synced < self.sync_interval
+            ):
+                return
+            tier.synced = now
+            seen = tier.seen
+        db = self.connection()
+        if seen is None:
+            (latest,) = db.execute(
+                'SELECT COALESCE(MAX(id), 0) FROM invalidations'
+            ).fetchone()
+            with tier.lock:
+                if tier.seen is None:
+                    tier.seen = latest
+            return
+        rows = db.execute(
+            'SELECT id, key FROM invalidations WHERE id > ? ORDER BY id',
+            (seen,)
+        ).fetchall()
+        if not rows:
+            return
+        with tier.lock:
+            if tier.seen != seen:
+                return
+            # Пропуск в номерах значит, что журнал обрезан раньше, чем
+            # мы его дочитали.
+            if rows[0][0] != seen + 1:
+                tier.entries.clear()
+            for number, key in rows:
+                if number in tier.own:
+                    tier.own.discard(number)
+                    continue
+                if key == CLEAR:
+                    tier.entries.clear()
+                else:
+                    tier.entries.pop(key, None)
+                tier.stats['invalidations'] += 1
+            tier.seen = rows[-1][0]
+            tier.generation += 1
+
+    def fetch(self, keys):
+        """Значения найденных ключей: сначала из LRU, остальные из файла."""
+        self.sync()
+        tier = self.tier
+        now = time.time()
+        found, missing = {}, []
+        with tier.lock:
+            generation = tier.generation
+            for key in keys:
+                entry = tier.entries.get(key)
+                if entry is None or expired(entry[0], now):
+                    missing.append(key)
+                    continue
+                tier.entries.move_to_end(key)
+                found[key] = entry[1]
+            tier.stats['local_hits'] += len(found)
+        shared = {}
+        db = self.connection()
+        for start in range(0, len(missing), CHUNK_SIZE):
+            chunk = missing[start:start + CHUNK_SIZE]
+            rows = db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({", ".join("?" * len(chunk))})', chunk
+            )
+            for key, value, expires in rows:
+                if not expired(expires, now):
+                    shared[key] = (expires, bytes(value))
+        if missing:
+            with tier.lock:
+                tier.stats['shared_hits'] += len(shared)
+                tier.stats['misses'] += len(missing) - len(shared)
+                if tier.generation == generation:
+                    for key, entry in shared.items():
+                        tier.put(key, entry)
+        found.update((key, entry[1]) for key, entry in shared.items())
+        return {key: pickle.loads(value) for key, value in found.items()}
+
+    def write(self, work):
+        """
+        Выполняет work(db) в одной транзакции общего хранилища. work
+        возвращает результат и изменения для LRU: ключ -> (срок, pickle)
+        или None для удалённых ключей; они же пишутся в журнал.
+        """
+        tier = self.tier
+        with tier.write_lock:
+            db = self.connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                result, changes = work(db)
+                numbers = [
+                    db.execute(
+                        'INSERT INTO invalidations (key) VALUES (?)', (key,)
+                    ).lastrowid
+                    for key in changes
+                ]
+                tier.writes += 1
+                if tier.writes % self.cull_every == 0:
+                    self.cull(db)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            with tier.lock:
+                tier.own.update(numbers)
+                tier.generation += 1
+                for key, entry in changes.items():
+                    if key == CLEAR:
+                        tier.entries.clear()
+                    elif entry is None:
+                        tier.entries.pop(key, None)
+                    else:
+                        tier.put(key, entry)
+        return result
+
+    def cull(self, db):
+        db.execute(
+            'DELETE FROM invalidations WHERE id <= '
+            '(SELECT MAX(id) FROM invalidations) - ?', (self.log_size,)
+        )
+        db.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        (count,) = db.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries:
+            # Ключи без срока удаляются последними.
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    def store(self, data, timeout, only_new=False):
+        expires = self.get_backend_timeout(timeout)
+        if expired(expires, time.time()):
+            self.write(lambda db: self.remove(db, list(data)))
+            return not only_new
+        pickled = {
+            key: pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            for key, value in data.items()
+        }
+
+        def work(db):
+            if only_new:
+                row = db.execute(
+                    'SELECT expires FROM cache WHERE key = ?', tuple(data)
+                ).fetchone()
+                if row is not None and not expired(row[0], time.time()):
+                    return False, {}
+            db.executemany(
+                'REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                [(key, value, expires) for key, value in pickled.items()]
+            )
+            self.tier.stats['sets'] += len(pickled)
+            return True, {
+                key: (expires, value) for key, value in pickled.items()
+            }
+        return self.write(work)
+
+    def remove(self, db, keys):
+        db.executemany(
+            'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+        )
+        self.tier.stats['deletes'] += len(keys)
+        return None, dict.fromkeys(keys)
+
+    def key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.store(
+            {self.key(key, version): value}, timeout, only_new=True
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self.key(key, version)
+        return self.fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.key(key, version): key for key in keys}
+        return {
+            made[key]: value for key, value in self.fetch(list(made)).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.store({self.key(key, version): value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if data:
+            self.store({
+                self.key(key, version): value for key, value in data.items()
+            }, timeout)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        expires = self.get_backend_timeout(timeout)
+
+        def work(db):
+            updated = db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? AND '
+                '(expires IS NULL OR expires > ?)',
+                (expires, key, time.time())
+            ).rowcount
+            return bool(updated), {key: None}
+        return self.write(work)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись в одной транзакции."""
+        key = self.key(key, version)
+
+        def work(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or expired(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?', (pickled, key)
+            )
+            self.tier.stats['sets'] += 1
+            return value, {key: (row[1], pickled)}
+        return self.write(work)
+
+    def update(self, key, func, version=None):
+        """
+        Атомарно для всех процессов меняет значение ключа: func получает
+        текущее значение (None, если ключа нет) и возвращает (результат,
+        новое значение, timeout). Новое значение None оставляет ключ
+        как есть. Отдаёт результат func.
+        """
+        key = self.key(key, version)
+
+        def work(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            current = None
+            if row is not None and not expired(row[1], time.time()):
+                current = pickle.loads(row[0])
+            result, value, timeout = func(current)
+            if value is None:
+                return result, {}
+            expires = self.get_backend_timeout(timeout)
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, pickled, expires)
+            )
+            self.tier.stats['sets'] += 1
+            return result, {key: (expires, pickled)}
+        return self.write(work)
+
+    def delete(self, key, version=None):
+        key = self.key(key, version)
+        self.write(lambda db: self.remove(db, [key]))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.key(key, version) for key in keys]
+        if keys:
+            self.write(lambda db: self.remove(db, keys))
+
+    def clear(self):
+        def work(db):
+            db.execute('DELETE FROM cache')
+            return None, {CLEAR: None}
+        self.write(work)
+
+    def metrics(self):
+        """Счётчики процесса и доля попаданий в любой из уровней."""
+        tier = self.tier
+        with tier.lock:
+            stats = dict(tier.stats, local_entries=len(tier.entries))
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round(
+            (lookups - stats['misses']) / lookups, 4
+        ) if lookups else None
+        return stats
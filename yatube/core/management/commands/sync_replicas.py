@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик через backup API: '
+        'открытые соединения реплики видят новую копию целиком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Алиасы реплик; по умолчанию DATABASE_REPLICAS'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не настроены: DATABASE_REPLICAS пуст')
+        unknown = [alias for alias in aliases if alias not in connections]
+        if unknown:
+            raise CommandError(f'Неизвестные базы: {", ".join(unknown)}')
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        for alias in aliases:
+            path = connections[alias].settings_dict['NAME']
+            # Файл не подменяем: его -wal и -shm остались бы от старой
+            # базы у соединений, которые держат воркеры.
+            target = sqlite3.connect(path)
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f'{alias}: {path}'))
@@ -0,0 +1,106 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def bucket_key(name, ident):
+    return f'ratelimit:{name}:{ident}'
+
+
+def client_ident(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def take(name, ident, capacity, period):
+    """
+    Берёт токен из бакета. Бакет хранится одним числом — моментом, когда
+    он снова наполнится (GCRA). Чтение, проверка и запись идут одной
+    транзакцией кэша (TieredCache.update), иначе параллельные запросы
+    прочитали бы одно значение и прошли все. Отдаёт 0 или сколько
+    секунд ждать токена. У кэша без update — take_window().
+    """
+    if not hasattr(cache, 'update'):
+        return take_window(name, ident, capacity, period)
+    interval = period / capacity
+    now = time.time()
+
+    def step(stored):
+        full_at = max(stored or now, now) + interval
+        if full_at - now > period:
+            return full_at - period - now, None, None
+        return 0, full_at, math.ceil(full_at - now)
+    return cache.update(bucket_key(name, ident), step)
+
+
+def take_window(name, ident, capacity, period):
+    """
+    Запасной лимит для любого бэкенда кэша: счётчик запросов в окне
+    длиной period. add и incr атомарны, но на границе окна подряд
+    может пройти до 2 * capacity запросов.
+    """
+    now = time.time()
+    window = int(now // period)
+    key = f'{bucket_key(name, ident)}:{window}'
+    timeout = math.ceil(period) + 1
+    cache.add(key, 0, timeout)
+    try:
+        taken = cache.incr(key)
+    except ValueError:
+        # Запись успела пропасть между add и incr.
+        cache.set(key, 1, timeout)
+        taken = 1
+    if taken <= capacity:
+        return 0
+    return (window + 1) * period - now
+
+
+def count(name, outcome):
+    with _counters_lock:
+        counters = _counters.setdefault(name, {'allowed': 0, 'limited': 0})
+        counters[outcome] += 1
+
+
+def metrics():
+    """Пропущенные и отклонённые запросы по лимитам с запуска воркера."""
+    with _counters_lock:
+        return {name: dict(counters) for name, counters in _counters.items()}
+
+
+def rate_limit(name, methods=None):
+    """
+    Ограничивает view токен-бакетом RATE_LIMITS[name] = (запросов
+    подряд, секунд на полное наполнение) отдельно для каждого
+    пользователя, а для анонимов — для каждого IP. methods — какие
+    запросы считать; по умолчанию все. Сверх лимита — 429 с Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limit = settings.RATE_LIMITS.get(name)
+            if limit is None or (
+                methods is not None and request.method not in methods
+            ):
+                return view(request, *args, **kwargs)
+            wait = take(name, client_ident(request), *limit)
+            if wait:
+                count(name, 'limited')
+                response = render(
+                    request, 'core/429.html', {'retry_after': wait},
+                    status=429
+                )
+                response['Retry-After'] = math.ceil(wait)
+                return response
+            count(name, 'allowed')
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,92 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Кука держит пользователя на основной базе, пока реплики догоняют
+# его запись; срок жизни — REPLICA_PIN_SECONDS.
+PIN_COOKIE = 'primary_pin'
+READ_METHODS = ('GET', 'HEAD')
+# Реплики отстают до следующего sync_replicas: сессии, пользователи и
+# прочие служебные таблицы всегда читаются с основной базы.
+REPLICA_APPS = ('posts',)
+
+_state = threading.local()
+
+
+def read_replica(view):
+    """Разрешает view читать с реплик: только для страниц без записи."""
+    view.read_replica = True
+    return view
+
+
+def pin_to_primary():
+    """Отмечает запись, сделанную за запрос в другом потоке."""
+    _state.wrote = True
+
+
+def replica_reads():
+    return getattr(_state, 'replica', False) and not getattr(
+        _state, 'wrote', False
+    )
+
+
+class ReplicaRouter:
+    """
+    Записи идут в default, чтения моделей из REPLICA_APPS — в случайную
+    реплику из DATABASE_REPLICAS, но только внутри запроса к view
+    с read_replica. После первой записи запрос дочитывает с основной
+    базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and model._meta.app_label in REPLICA_APPS
+            and replica_reads()
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики — копии основной базы, см. команду sync_replicas.
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Включает чтение с реплик для GET к view с read_replica, если
+    пользователь не закреплён за основной базой. Запрос с записью
+    ставит куку закрепления.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica = _state.wrote = False
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                response.set_cookie(
+                    PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite='Lax',
+                )
+        finally:
+            _state.replica = _state.wrote = False
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.replica = (
+            getattr(view_func, 'read_replica', False)
+            and request.method in READ_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        )
@@ -0,0 +1,42 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .cache import isolated_caches
+
+
+@contextmanager
+def isolated_cache():
+    """Файлы кэша на время блока лежат во временном каталоге."""
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    try:
+        with override_settings(CACHES=isolated_caches(directory)):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def testing_environment():
+    """
+    Настройки тестов: изолированный кэш и строгие бюджеты запросов,
+    чтобы превышение роняло тест, а не только писалось в лог.
+    """
+    with isolated_cache(), override_settings(QUERY_BUDGET_STRICT=True):
+        yield
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты идут в testing_environment()."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.environment = testing_environment()
+        self.environment.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.environment.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -1,4 +1,47 @@
-from django.test import TestCase
+import io
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import ratelimit
+from core.backends.sqlite3.base import DatabaseWrapper
+from core.cache import TieredCache
+from core.replicas import PIN_COOKIE, ReplicaRouter
+from core.runner import testing_environment
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+def tiered_cache(location, **options):
+    return TieredCache(location, {'OPTIONS': {'SYNC_INTERVAL': 0, **options}})
+
+
+def write_in_child(location, key, value):
+    """Запись из отдельного процесса со своим локальным уровнем."""
+    cache = tiered_cache(location)
+    if value is None:
+        cache.clear()
+    else:
+        cache.set(key, value)
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +49,331 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+    def test_metrics_for_staff_only(self):
+        """Тест: счётчики кэша видны только персоналу"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.assertIn('hit_rate', self.client.get(url).json()['cache'])
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.location = os.path.join(self.workdir, 'cache.sqlite3')
+        self.cache = tiered_cache(self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def in_child(self, key, value):
+        process = multiprocessing.get_context('fork').Process(
+            target=write_in_child, args=(self.location, key, value)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+
+    def test_cache_api(self):
+        """Тест: операции кэша ведут себя как у встроенных бэкендов"""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertEqual(
+            self.cache.get_many(['key', 'new', 'missing']),
+            {'key': {'value': 1}, 'new': 'value'},
+        )
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.decr('counter'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete_many(['key', 'new'])
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('short', 'value', 0.05)
+        time.sleep(0.1)
+        self.assertEqual(self.cache.get('short', 'expired'), 'expired')
+
+    def test_shared_between_processes(self):
+        """Тест: запись другого процесса сбрасывает локальный уровень"""
+        self.cache.set('key', 'old')
+        self.assertEqual(self.cache.get('key'), 'old')
+        self.in_child('key', 'new')
+        self.assertEqual(self.cache.get('key'), 'new')
+        self.in_child('other', 'value')
+        self.assertEqual(self.cache.get('other'), 'value')
+        self.in_child(None, None)
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_metrics(self):
+        """Тест: счётчики различают попадания в уровни и промахи"""
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get('missing')
+        self.in_child('shared', 'value')
+        self.cache.get('shared')
+        metrics = self.cache.metrics()
+        self.assertEqual(
+            (metrics['local_hits'], metrics['shared_hits'],
+             metrics['misses']),
+            (1, 1, 1),
+        )
+        self.assertEqual(metrics['hit_rate'], round(2 / 3, 4))
+
+    def test_local_lru(self):
+        """Тест: локальный уровень хранит не больше LOCAL_MAX_ENTRIES"""
+        cache = tiered_cache(
+            os.path.join(self.workdir, 'lru.sqlite3'), LOCAL_MAX_ENTRIES=2
+        )
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(cache.metrics()['local_entries'], 2)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {
+            'a': 1, 'b': 2, 'c': 3,
+        })
+        self.assertEqual(cache.metrics()['shared_hits'], 1)
+
+
+@override_settings(DATABASE_REPLICAS=('replica',))
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client.force_login(self.user)
+
+    def queries(self, method, url, **data):
+        """Ответ и число чтений таблиц posts на каждой базе."""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = getattr(self.client, method)(url, data)
+        self.assertFalse([
+            query for query in replica if 'django_session' in query['sql']
+        ])
+        return response, *(
+            len([
+                query for query in context
+                if 'FROM "posts_' in query['sql']
+            ])
+            for context in (primary, replica)
+        )
+
+    def test_reads_from_replica(self):
+        """Тест: страницы читаются с реплики, формы и сессии — с основной
+        базы"""
+        Follow.objects.create(
+            user=self.user, author=User.objects.create_user(username='other')
+        )
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                response, primary, replica = self.queries('get', url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+        _, _, replica = self.queries('get', reverse('posts:post_create'))
+        self.assertEqual(replica, 0)
+
+    def test_only_posts_on_replica(self):
+        """Тест: на реплику уходят только модели posts"""
+        router = ReplicaRouter()
+        with mock.patch('core.replicas.replica_reads', return_value=True):
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            for model in (User, Session, ContentType):
+                with self.subTest(model=model):
+                    self.assertEqual(router.db_for_read(model), 'default')
+
+    def test_pinned_after_write(self):
+        """Тест: после записи пользователь читает с основной базы"""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response, _, _ = self.queries(
+            'post', reverse('posts:add_comment', args=(self.post.pk,)),
+            text='Комментарий'
+        )
+        self.assertEqual(
+            response.cookies[PIN_COOKIE]['max-age'],
+            settings.REPLICA_PIN_SECONDS
+        )
+        response, _, replica = self.queries('get', url)
+        self.assertContains(response, 'Комментарий')
+        self.assertEqual(replica, 0)
+        del self.client.cookies[PIN_COOKIE]
+        _, primary, _ = self.queries('get', url)
+        self.assertEqual(primary, 0)
+
+
+class SyncReplicasTest(TransactionTestCase):
+    def test_sync(self):
+        """Тест: команда копирует основную базу в файл реплики"""
+        Post.objects.create(
+            author=User.objects.create_user(username='auth'), text='Пост'
+        )
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        path = os.path.join(workdir, 'replica.sqlite3')
+        # Соединение воркера, открытое до синхронизации.
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        replica.execute('PRAGMA journal_mode=WAL')
+        with mock.patch.dict(connections['replica'].settings_dict, NAME=path):
+            call_command('sync_replicas', 'replica', stdout=io.StringIO())
+            self.assertEqual(
+                replica.execute('SELECT text FROM posts_post').fetchall(),
+                [('Пост',)]
+            )
+            Post.objects.update(text='Новый текст')
+            call_command('sync_replicas', 'replica', stdout=io.StringIO())
+        self.assertEqual(
+            replica.execute('SELECT text FROM posts_post').fetchall(),
+            [('Новый текст',)]
+        )
+
+
+class SqliteBackendTest(SimpleTestCase):
+    def setUp(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        self.wrapper = DatabaseWrapper({
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(workdir, 'db.sqlite3'),
+        }, alias='tuned')
+        self.addCleanup(self.wrapper.close)
+
+    def test_pragmas(self):
+        """Тест: новое соединение получает PRAGMA из OPTIONS"""
+        pragmas = settings.SQLITE_OPTIONS['pragmas']
+        with self.wrapper.cursor() as cursor:
+            for name in pragmas:
+                with self.subTest(name=name):
+                    cursor.execute(f'PRAGMA {name}')
+                    self.assertIsNotNone(cursor.fetchone())
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], pragmas['cache_size'])
+
+    def test_immediate_transactions(self):
+        """Тест: atomic сразу берёт блокировку на запись"""
+        self.wrapper.force_debug_cursor = True
+        self.wrapper.ensure_connection()
+        self.wrapper._start_transaction_under_autocommit()
+        self.assertEqual(
+            self.wrapper.queries[-1]['sql'], 'BEGIN IMMEDIATE'
+        )
+        self.wrapper.connection.rollback()
+
+
+@override_settings(RATE_LIMITS={'add_comment': (2, 60), 'signup': (1, 60)})
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:add_comment', args=(self.post.pk,))
+
+    def comment(self, client=None):
+        return (client or self.client).post(self.url, {'text': 'Коммент'})
+
+    def test_limit_per_user(self):
+        """Тест: сверх лимита запросы пользователя получают 429"""
+        before = ratelimit.metrics().get('add_comment', {'limited': 0})
+        for _ in range(2):
+            self.assertEqual(self.comment().status_code, 302)
+        response = self.comment()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.post.comments.count(), 2)
+        self.assertEqual(
+            ratelimit.metrics()['add_comment']['limited'],
+            before['limited'] + 1
+        )
+        other = self.client_class()
+        other.force_login(User.objects.create_user(username='other'))
+        self.assertEqual(self.comment(other).status_code, 302)
+
+    def test_concurrent_takes(self):
+        """Тест: из параллельных запросов проходят не больше capacity"""
+        capacity, callers = 5, 20
+        barrier = threading.Barrier(callers)
+        waits = []
+
+        def call():
+            barrier.wait()
+            waits.append(ratelimit.take('burst', 'user:1', capacity, 60))
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(waits.count(0), capacity)
+
+    def test_bucket_refills(self):
+        """Тест: токены возвращаются со временем"""
+        now = time.time()
+        with mock.patch('core.ratelimit.time.time', return_value=now):
+            self.comment()
+            self.comment()
+            self.assertEqual(self.comment().status_code, 429)
+        with mock.patch('core.ratelimit.time.time', return_value=now + 31):
+            self.assertEqual(self.comment().status_code, 302)
+            self.assertEqual(self.comment().status_code, 429)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_cache_without_update(self):
+        """Тест: лимит работает и на кэше без TieredCache.update"""
+        self.assertFalse(hasattr(cache, 'update'))
+        with mock.patch('core.ratelimit.time.time', return_value=6000):
+            for _ in range(2):
+                self.assertEqual(self.comment().status_code, 302)
+            response = self.comment()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        with mock.patch('core.ratelimit.time.time', return_value=6060):
+            self.assertEqual(self.comment().status_code, 302)
+
+    def test_signup_limited_by_ip(self):
+        """Тест: регистрация ограничена по IP, показ формы — нет"""
+        self.client.logout()
+        url = reverse('users:signup')
+        data = {'username': 'new', 'password1': 'x', 'password2': 'y'}
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        self.assertEqual(self.client.post(url, data).status_code, 429)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, data, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_endpoint(self):
+        """Тест: счётчики лимитов видны в /metrics/"""
+        self.comment()
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        response = self.client.get(reverse('metrics'))
+        self.assertIn('add_comment', response.json()['rate_limits'])
+
+
+class TestRunnerTest(SimpleTestCase):
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_strict_query_budgets(self):
+        """Тест: в тестах превышение бюджета запросов роняет запрос
+        независимо от DEBUG"""
+        with testing_environment():
+            self.assertIs(settings.QUERY_BUDGET_STRICT, True)
+        self.assertIs(settings.QUERY_BUDGET_STRICT, False)
@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import ratelimit
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -7,3 +12,13 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def metrics(request):
+    """Счётчики воркера, который обработал запрос, для мониторинга."""
+    cache_metrics = getattr(cache, 'metrics', None)
+    return JsonResponse({
+        'cache': cache_metrics() if cache_metrics else None,
+        'rate_limits': ratelimit.metrics(),
+    })
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Group, Post
+from .search import match_expression, matching_ids
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +17,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        expression = match_expression(search_term)
+        if not expression:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(expression)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
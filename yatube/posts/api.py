@@ -0,0 +1,250 @@
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.db import models
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .middleware import query_budget
+from .models import Comment, Group, Post, User
+from .timeline import FEED_FIELDS, feed
+from .utils import CursorPaginator
+
+MAX_LIMIT = 100
+
+
+class ApiError(ValueError):
+    pass
+
+
+def expand_users(ids):
+    users = User.objects.only(
+        'username', 'first_name', 'last_name'
+    ).in_bulk(ids)
+    return {
+        pk: {
+            'id': pk,
+            'username': user.username,
+            'full_name': user.get_full_name(),
+        }
+        for pk, user in users.items()
+    }
+
+
+def expand_groups(ids):
+    groups = Group.objects.only('slug', 'title').in_bulk(ids)
+    return {
+        pk: {'id': pk, 'slug': group.slug, 'title': group.title}
+        for pk, group in groups.items()
+    }
+
+
+class Resource:
+    """
+    Описание выдачи модели. fields — имя в JSON -> поле модели; по
+    запрошенным полям строится .only(), поэтому ненужные колонки (text)
+    не читаются. expand — связи, которые подгружаются одним запросом
+    на страницу вместо запроса на каждый объект.
+    """
+    model = None
+    fields = {}
+    default_fields = ()
+    expand = {}
+    # Поля, без которых не построить курсор.
+    required = ('pk',)
+
+    def parse(self, request):
+        fields = self.split(request.GET.get('fields'), self.default_fields)
+        expand = self.split(request.GET.get('expand'), ())
+        unknown = [name for name in fields if name not in self.fields]
+        unknown += [name for name in expand if name not in self.expand]
+        if unknown:
+            raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+        return fields, [name for name in expand if name in fields]
+
+    def split(self, value, default):
+        if not value:
+            return list(default)
+        return [name for name in value.split(',') if name]
+
+    def queryset(self, queryset, fields):
+        columns = {self.fields[name] for name in fields}
+        columns.update(self.required)
+        return queryset.only(*columns)
+
+    def serialize(self, objects, fields, expand):
+        expanded = {
+            name: self.expand[name]({
+                getattr(obj, f'{self.fields[name]}_id') for obj in objects
+            } - {None})
+            for name in expand
+        }
+        results = []
+        for obj in objects:
+            record = {}
+            for name in fields:
+                if name in expanded:
+                    related = getattr(obj, f'{self.fields[name]}_id')
+                    record[name] = expanded[name].get(related)
+                else:
+                    record[name] = self.value(obj, name)
+            results.append(record)
+        return results
+
+    def value(self, obj, name):
+        column = self.fields[name]
+        if column == 'pk':
+            return obj.pk
+        field = self.model._meta.get_field(column)
+        if isinstance(field, models.FileField):
+            image = getattr(obj, column)
+            return image.url if image else None
+        value = getattr(obj, field.attname)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+
+class PostResource(Resource):
+    model = Post
+    fields = {
+        'id': 'pk',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author',
+        'group': 'group',
+        'image': 'image',
+        'comments_count': 'comments_count',
+    }
+    default_fields = tuple(fields)
+    expand = {'author': expand_users, 'group': expand_groups}
+    required = ('pk', 'pub_date')
+
+
+class GroupResource(Resource):
+    model = Group
+    fields = {
+        'id': 'pk',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+        'posts_count': 'posts_count',
+    }
+    default_fields = tuple(fields)
+
+
+class CommentResource(Resource):
+    model = Comment
+    fields = {
+        'id': 'pk',
+        'post': 'post',
+        'author': 'author',
+        'text': 'text',
+        'created': 'created',
+    }
+    default_fields = tuple(fields)
+    expand = {'author': expand_users}
+    required = ('pk', 'created')
+
+
+def limit(request):
+    try:
+        value = int(request.GET.get('limit', settings.LIMITS_IN_PAGE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return max(1, min(value, MAX_LIMIT))
+
+
+def page_response(request, resource, queryset, cursor_fields):
+    fields, expand = resource.parse(request)
+    paginator = CursorPaginator(
+        resource.queryset(queryset, fields), limit(request), cursor_fields
+    )
+    page = paginator.get_cursor_page(request.GET.get('cursor'))
+    return {
+        'results': resource.serialize(page.object_list, fields, expand),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def api_view(budget):
+    """
+    Только GET, ответ — JSON; ApiError превращается в 400, Http404 —
+    в 404. budget — бюджет запросов к БД, как у HTML-страниц.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                data = view(request, *args, **kwargs)
+            except ApiError as error:
+                return JsonResponse({'error': str(error)}, status=400)
+            except Http404:
+                return JsonResponse({'error': 'Не найдено'}, status=404)
+            if isinstance(data, JsonResponse):
+                return data
+            return JsonResponse(
+                data, json_dumps_params={'ensure_ascii': False}
+            )
+        return query_budget(budget)(require_GET(wrapper))
+    return decorator
+
+
+@api_view(5)
+def post_list(request):
+    """Посты, новые сверху; фильтры author=<username> и group=<slug>."""
+    posts = Post.objects.all()
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    return page_response(request, PostResource(), posts, ('pub_date', 'pk'))
+
+
+@api_view(5)
+def post_item(request, post_id):
+    resource = PostResource()
+    fields, expand = resource.parse(request)
+    post = get_object_or_404(
+        resource.queryset(Post.objects.all(), fields), pk=post_id
+    )
+    return resource.serialize([post], fields, expand)[0]
+
+
+@api_view(4)
+def comment_list(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return page_response(
+        request, CommentResource(), Comment.objects.filter(post_id=post_id),
+        ('created', 'pk'),
+    )
+
+
+@api_view(3)
+def group_list(request):
+    return page_response(
+        request, GroupResource(), Group.objects.order_by('-pk'), ('pk', 'pk')
+    )
+
+
+@api_view(3)
+def group_item(request, slug):
+    resource = GroupResource()
+    fields, expand = resource.parse(request)
+    group = get_object_or_404(
+        resource.queryset(Group.objects.all(), fields), slug=slug
+    )
+    return resource.serialize([group], fields, expand)[0]
+
+
+@api_view(6)
+def follow_feed(request):
+    """Лента подписок текущего пользователя."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужна авторизация'}, status=401)
+    return page_response(
+        request, PostResource(), feed(request.user), FEED_FIELDS
+    )
@@ -0,0 +1,282 @@
+import random
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import OperationalError, connections
+from django.test import Client
+from django.urls import reverse
+
+from . import counters, timeline
+from .middleware import QueryCounter, counting
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+PERCENTILES = (50, 95, 99)
+USERNAME = 'bench{}'
+# Однопиксельный GIF: sorl-thumbnail строит из него миниатюры.
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def seed(users=50, groups=5, posts=1000, comments=2000, follows=200,
+         images=0.0, rng=None):
+    """
+    Заполняет базу данными для замера. images — доля постов с картинкой.
+    Счётчики и ленты подписок пересчитываются после массовой вставки,
+    потому что bulk_create не вызывает сигналы.
+    """
+    rng = rng or random.Random(0)
+    password = make_password(None)
+    User.objects.bulk_create(
+        (User(username=USERNAME.format(number), password=password)
+         for number in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    Group.objects.bulk_create(
+        (Group(title=f'Группа {number}', slug=f'bench-{number}',
+               description='Группа для замера')
+         for number in range(groups)),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith='bench'
+    ).values_list('pk', flat=True))
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-'
+    ).values_list('pk', flat=True))
+    image = ''
+    if images:
+        image = default_storage.save('posts/bench.gif', ContentFile(IMAGE))
+    Post.objects.bulk_create(
+        (Post(
+            text=f'Пост для замера номер {number}',
+            author_id=rng.choice(user_ids),
+            group_id=rng.choice(group_ids) if group_ids else None,
+            image=image if rng.random() < images else '',
+        ) for number in range(posts)),
+        batch_size=BATCH_SIZE,
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    Comment.objects.bulk_create(
+        (Comment(
+            post_id=rng.choice(post_ids),
+            author_id=rng.choice(user_ids),
+            text=f'Комментарий {number}',
+        ) for number in range(comments if post_ids else 0)),
+        batch_size=BATCH_SIZE,
+    )
+    pairs = set()
+    for _ in range(follows):
+        user_id, author_id = rng.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    for user_id, author_id in pairs:
+        timeline.backfill(user_id, author_id)
+    counters.rebuild()
+    cache.clear()
+
+
+class Scenario:
+    """Один вид запроса: build(rng) возвращает путь и данные формы."""
+
+    def __init__(self, name, build, method='get', login=True):
+        self.name = name
+        self.build = build
+        self.method = method
+        self.login = login
+
+    def request(self, rng):
+        path, data = self.build(rng)
+        return self.method, path, data
+
+
+class Mixed(Scenario):
+    """Смесь сценариев: каждый запрос выбирается по весам."""
+
+    def __init__(self, name, weighted):
+        super().__init__(name, None)
+        self.scenarios = [scenario for scenario, _ in weighted]
+        self.weights = [weight for _, weight in weighted]
+
+    def request(self, rng):
+        scenario = rng.choices(self.scenarios, self.weights)[0]
+        return scenario.request(rng)
+
+
+def default_scenarios():
+    usernames = list(User.objects.filter(
+        username__startswith='bench'
+    ).values_list('username', flat=True))
+    slugs = list(Group.objects.filter(
+        slug__startswith='bench-'
+    ).values_list('slug', flat=True))
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+
+    def post_url(name):
+        return lambda rng: (reverse(
+            name, kwargs={'post_id': rng.choice(post_ids)}
+        ), None)
+
+    scenarios = [
+        Scenario('index', lambda rng: (reverse('posts:index'), None)),
+        Scenario('group_posts', lambda rng: (reverse(
+            'posts:group_posts', kwargs={'slug': rng.choice(slugs)}
+        ), None)),
+        Scenario('profile', lambda rng: (reverse(
+            'posts:profile', kwargs={'username': rng.choice(usernames)}
+        ), None)),
+        Scenario('post_detail', post_url('posts:post_detail')),
+        Scenario('follow_index', lambda rng: (
+            reverse('posts:follow_index'), None
+        )),
+        Scenario('post_create', lambda rng: (
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'group': ''},
+        ), method='post'),
+        Scenario('add_comment', lambda rng: (
+            reverse('posts:add_comment', kwargs={
+                'post_id': rng.choice(post_ids)
+            }),
+            {'text': 'Новый комментарий'},
+        ), method='post'),
+    ]
+    by_name = {scenario.name: scenario for scenario in scenarios}
+    # Чтение страниц вперемешку с записью: 80% на 20%.
+    scenarios.append(Mixed('mixed', [
+        (by_name['index'], 3),
+        (by_name['post_detail'], 3),
+        (by_name['profile'], 2),
+        (by_name['post_create'], 1),
+        (by_name['add_comment'], 1),
+    ]))
+    return scenarios
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
+
+
+def peak_rss_kb():
+    # В Linux ru_maxrss измеряется в килобайтах, в macOS — в байтах.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def cache_lookups():
+    """Попадания и обращения к кэшу, если бэкенд их считает."""
+    metrics = getattr(cache, 'metrics', None)
+    if metrics is None:
+        return None
+    stats = metrics()
+    lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+    return lookups - stats['misses'], lookups
+
+
+def _worker(scenario, user, requests, seed_value):
+    rng = random.Random(seed_value)
+    client = Client()
+    if scenario.login:
+        client.force_login(user)
+    samples = []
+    try:
+        for _ in range(requests):
+            method, path, data = scenario.request(rng)
+            counter = QueryCounter(settings.QUERY_BUDGET_IGNORED_TABLES)
+            started = time.perf_counter()
+            locked = False
+            with counting(counter):
+                try:
+                    status = getattr(client, method)(path, data).status_code
+                except OperationalError as error:
+                    # Тестовый клиент пробрасывает исключение view.
+                    status, locked = 500, 'locked' in str(error)
+            samples.append((
+                time.perf_counter() - started,
+                len(counter.queries),
+                status,
+                locked,
+            ))
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+    return samples
+
+
+def run(scenario, concurrency, requests):
+    """
+    Прогоняет сценарий requests раз в concurrency потоках, у каждого
+    потока свой клиент и свой пользователь. При concurrency=1 запросы
+    идут в текущем потоке.
+    """
+    users = list(User.objects.filter(
+        username__startswith='bench'
+    ).order_by('pk')[:concurrency])
+    shares = [
+        requests // concurrency + (index < requests % concurrency)
+        for index in range(concurrency)
+    ]
+    lookups_before = cache_lookups()
+    started = time.perf_counter()
+    if concurrency == 1:
+        samples = _worker(scenario, users[0], shares[0], 0)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(
+                    _worker, scenario, users[index % len(users)],
+                    shares[index], index
+                )
+                for index in range(concurrency)
+            ]
+            samples = [
+                sample for future in futures for sample in future.result()
+            ]
+    elapsed = time.perf_counter() - started
+    lookups_after = cache_lookups()
+    latencies = [sample[0] * 1000 for sample in samples]
+    queries = [sample[1] for sample in samples]
+    result = {
+        'scenario': scenario.name,
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[2] >= 400),
+        'locked': sum(1 for sample in samples if sample[3]),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'queries_avg': round(sum(queries) / len(queries), 2) if queries else 0,
+        'queries_max': max(queries, default=0),
+        'peak_rss_kb': peak_rss_kb(),
+        'cache_hit_rate': None,
+    }
+    if lookups_before is not None:
+        hits = lookups_after[0] - lookups_before[0]
+        lookups = lookups_after[1] - lookups_before[1]
+        result['cache_hit_rate'] = (
+            round(hits / lookups, 4) if lookups else None
+        )
+    for percent in PERCENTILES:
+        value = percentile(latencies, percent)
+        result[f'p{percent}_ms'] = (
+            round(value, 3) if value is not None else None
+        )
+    return result
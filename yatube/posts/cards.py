@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .versions import bump, stamp
+
+CARD_TEMPLATE = 'posts/includes/article.html'
+# Общая версия всех карточек: для массовых правок мимо сигналов.
+ALL_CARDS = ('cards', 'all')
+
+
+def card_key(post, show_author, show_group):
+    objects = [ALL_CARDS, ('post', post.pk), ('author', post.author_id)]
+    if post.group_id is not None:
+        objects.append(('group', post.group_id))
+    return (
+        f'post_card:{post.pk}:{post.group_id}:{stamp(*objects)}:'
+        f'{int(bool(show_author))}{int(bool(show_group))}'
+    )
+
+
+def render_card(post, show_author=False, show_group=False):
+    """Карточка поста из кэша; общая для всех страниц-списков."""
+    key = card_key(post, show_author, show_group)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(CARD_TEMPLATE, {
+            'post': post,
+            'show_author': show_author,
+            'show_group': show_group,
+        })
+        cache.set(key, html, settings.POST_CARD_TIMEOUT)
+    return html
+
+
+def invalidate_all():
+    bump(*ALL_CARDS)
@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import cards, page_cache
+from .models import AuthorCounter, Comment, Group, Post
+from .versions import after_commit
+
+_executor = None
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _changeable(queryset, field, delta):
+    """Не даёт рассинхронизированному счётчику уйти ниже нуля."""
+    if delta < 0:
+        return queryset.filter(**{f'{field}__gte': -delta})
+    return queryset
+
+
+def change_author_posts(author_id, delta):
+    updated = _changeable(
+        AuthorCounter.objects.filter(author_id=author_id),
+        'posts_count', delta
+    ).update(
+        posts_count=F('posts_count') + delta
+    )
+    if not updated and delta > 0:
+        AuthorCounter.objects.create(author_id=author_id, posts_count=delta)
+
+
+def change_group_posts(group_id, delta):
+    if group_id is not None:
+        _changeable(
+            Group.objects.filter(pk=group_id), 'posts_count', delta
+        ).update(
+            posts_count=F('posts_count') + delta
+        )
+
+
+def change_post_comments(post_id, delta):
+    _changeable(
+        Post.objects.filter(pk=post_id), 'comments_count', delta
+    ).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def count_subquery(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на внешний pk."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Пересчитывает все счётчики с нуля и сбрасывает карточки и страницы,
+    которые их показывают.
+    """
+    Post.objects.update(comments_count=count_subquery(Comment, 'post'))
+    Group.objects.update(posts_count=count_subquery(Post, 'group'))
+    AuthorCounter.objects.all().delete()
+    AuthorCounter.objects.bulk_create(
+        AuthorCounter(author_id=row['author'], posts_count=row['total'])
+        for row in Post.objects.order_by().values('author').annotate(
+            total=Count('pk')
+        )
+    )
+    cards.invalidate_all()
+    page_cache.invalidate_all()
+
+
+def count_key(scope, value=''):
+    return f'page_count:{scope}:{value}'
+
+
+def forget_count(scope, value=''):
+    after_commit(cache.delete, count_key(scope, value))
+
+
+def largest_post_id():
+    """Оценка числа постов по наибольшему id: одно чтение индекса."""
+    return Post.objects.aggregate(largest=Max('pk'))['largest'] or 0
+
+
+def refresh_count(key, queryset):
+    try:
+        cache.set(
+            key, (queryset.count(), time.time()), settings.PAGE_COUNT_TIMEOUT
+        )
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PAGE_COUNT_WORKERS
+        )
+    return _executor
+
+
+def schedule_count(key, queryset):
+    """Пересчёт после коммита в фоновом потоке, не больше одного на ключ."""
+    def submit():
+        with _refreshing_lock:
+            if key in _refreshing:
+                return
+            _refreshing.add(key)
+        if not settings.PAGE_COUNT_WORKERS:
+            return refresh_count(key, queryset)
+        executor().submit(refresh_count, key, queryset)
+    transaction.on_commit(submit)
+
+
+def cached_count(scope, value, queryset, estimate=None):
+    """
+    Число записей для навигации по страницам. Значение из кэша старше
+    PAGE_COUNT_REFRESH отдаётся как есть, а COUNT(*) уходит в фон. Пока
+    кэш пуст, отдаём estimate() или, без оценки, считаем сразу.
+    """
+    key = count_key(scope, value)
+    cached = cache.get(key)
+    if cached is None and estimate is None:
+        count = queryset.count()
+        cache.set(key, (count, time.time()), settings.PAGE_COUNT_TIMEOUT)
+        return count
+    if cached is None:
+        schedule_count(key, queryset)
+        return estimate()
+    count, counted = cached
+    if time.time() - counted > settings.PAGE_COUNT_REFRESH:
+        schedule_count(key, queryset)
+    return count
@@ -0,0 +1,266 @@
+import io
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from . import counters, follow_graph, timeline
+from .models import Comment, Follow, Group, Post, User
+
+TEXT_POOL = 2000
+IMAGE_SIZE = (960, 540)
+# Показатели степенных распределений: чем меньше, тем тяжелее хвост.
+AUTHOR_SKEW = 1.1
+FOLLOW_ALPHA = 1.5
+BURST_ALPHA = 1.2
+BURST_SIZE = 20
+MAX_BURST = 500
+
+
+@contextmanager
+def explicit_dates():
+    """Позволяет задавать pub_date и created при массовой вставке."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def popularity(count, rng):
+    """
+    Накопленные веса по закону Ципфа для count объектов: rng.choices
+    с такими весами даёт немногих очень популярных и длинный хвост.
+    """
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(
+        itertools.accumulate(1 / rank ** AUTHOR_SKEW for rank in ranks)
+    )
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Generator:
+    """
+    Генерирует синтетический набор данных пачками по batch_size строк,
+    каждая пачка — в своей транзакции. Память зависит от числа
+    пользователей, но не от числа постов и комментариев.
+    """
+
+    def __init__(self, users, groups, posts, follow_scale=3.0, comments=2.0,
+                 bursts=0.01, images=0.0, image_pool=20, days=365,
+                 batch_size=5000, seed=0, report=None):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.follow_scale = follow_scale
+        self.comments = comments
+        self.bursts = bursts
+        self.images = images
+        self.image_pool = image_pool
+        self.days = days
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.report = report or (lambda message: None)
+        self.texts = [self.faker.paragraph() for _ in range(TEXT_POOL)]
+
+    def run(self):
+        started = time.perf_counter()
+        self.user_ids = self.create_users()
+        self.group_ids = self.create_groups()
+        self.weights = popularity(len(self.user_ids), self.rng)
+        self.create_follows()
+        follow_graph.invalidate_all()
+        self.heavy_ids = follow_graph.heavy_authors()
+        self.image_names = self.create_images()
+        rows = self.create_posts()
+        counters.rebuild()
+        return rows, time.perf_counter() - started
+
+    def insert(self, model, objects):
+        total = 0
+        for chunk in chunked(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, ignore_conflicts=True)
+            total += len(chunk)
+        return total
+
+    def create_users(self):
+        last_pk = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        password = make_password(None)
+        self.insert(User, (
+            User(
+                username=f'{self.faker.user_name()}{number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            ) for number in range(last_pk, last_pk + self.users)
+        ))
+        return list(User.objects.filter(pk__gt=last_pk).values_list(
+            'pk', flat=True
+        ))
+
+    def create_groups(self):
+        last_pk = Group.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.insert(Group, (
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'group-{number}',
+                description=self.faker.sentence(),
+            ) for number in range(last_pk, last_pk + self.groups)
+        ))
+        return list(Group.objects.filter(pk__gt=last_pk).values_list(
+            'pk', flat=True
+        ))
+
+    def create_follows(self):
+        """
+        Число подписок пользователя распределено по Парето, а авторов
+        выбирают по популярности: у подписчиков тоже степенной хвост.
+        """
+        def follows():
+            for user_id in self.user_ids:
+                degree = min(
+                    len(self.user_ids) - 1,
+                    int(self.rng.paretovariate(FOLLOW_ALPHA)
+                        * self.follow_scale) - 1,
+                )
+                if degree <= 0:
+                    continue
+                authors = set(self.rng.choices(
+                    self.user_ids, cum_weights=self.weights, k=degree
+                ))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        return self.insert(Follow, follows())
+
+    def create_images(self):
+        if not self.images:
+            return []
+        from PIL import Image
+
+        names = []
+        for number in range(self.image_pool):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/dataset-{number}.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def post(self, pub_date):
+        rng = self.rng
+        return Post(
+            text=rng.choice(self.texts),
+            pub_date=pub_date,
+            author_id=rng.choices(
+                self.user_ids, cum_weights=self.weights
+            )[0],
+            group_id=(
+                rng.choice(self.group_ids)
+                if self.group_ids and rng.random() < 0.7 else None
+            ),
+            image=(
+                rng.choice(self.image_names)
+                if self.image_names and rng.random() < self.images else ''
+            ),
+        )
+
+    def post_comments(self, post_id, pub_date):
+        """
+        Обычно под постом несколько комментариев за пару дней, но
+        изредка случается всплеск: сотни комментариев за час.
+        """
+        rng = self.rng
+        if rng.random() < self.bursts:
+            count = min(
+                MAX_BURST, int(rng.paretovariate(BURST_ALPHA) * BURST_SIZE)
+            )
+            window = 60 * 60
+        else:
+            count = int(rng.expovariate(1 / self.comments)) if (
+                self.comments
+            ) else 0
+            window = 2 * 24 * 60 * 60
+        for _ in range(count):
+            yield Comment(
+                post_id=post_id,
+                author_id=rng.choice(self.user_ids),
+                text=rng.choice(self.texts),
+                created=pub_date + timedelta(seconds=rng.uniform(0, window)),
+            )
+
+    def create_posts(self):
+        """
+        Посты идут по возрастанию pub_date; в той же транзакции, что и
+        пачка постов, создаются их комментарии и записи лент.
+        """
+        end = timezone.now()
+        step = timedelta(days=self.days) / max(self.posts, 1)
+        start = end - step * self.posts
+        rows = 0
+        created = 0
+        started = time.perf_counter()
+        with explicit_dates():
+            while created < self.posts:
+                size = min(self.batch_size, self.posts - created)
+                with transaction.atomic():
+                    last_pk = Post.objects.aggregate(
+                        last=Max('pk')
+                    )['last'] or 0
+                    Post.objects.bulk_create([
+                        self.post(start + step * (created + number))
+                        for number in range(size)
+                    ])
+                    new_posts = Post.objects.filter(
+                        pk__gt=last_pk
+                    ).order_by('pk').values_list('pk', 'pub_date')
+                    comments = 0
+                    for chunk in chunked(
+                        itertools.chain.from_iterable(
+                            self.post_comments(pk, pub_date)
+                            for pk, pub_date in new_posts.iterator()
+                        ),
+                        self.batch_size,
+                    ):
+                        Comment.objects.bulk_create(chunk)
+                        comments += len(chunk)
+                    entries = timeline.fan_out_after(
+                        last_pk, self.heavy_ids
+                    )
+                created += size
+                rows += size + comments + entries
+                elapsed = time.perf_counter() - started
+                self.report(
+                    f'Постов: {created}/{self.posts}, строк: {rows}, '
+                    f'{rows / elapsed:.0f} строк/с'
+                )
+        return rows
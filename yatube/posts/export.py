@@ -0,0 +1,83 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post
+
+JSONL = 'jsonl'
+CSV = 'csv'
+FORMATS = {
+    JSONL: 'application/x-ndjson; charset=utf-8',
+    CSV: 'text/csv; charset=utf-8',
+}
+# Поля совпадают с теми, что понимает import_posts.
+FIELDS = ('id', 'author', 'group', 'pub_date', 'text', 'image',
+          'comments_count')
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Псевдофайл для csv.writer: write() возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def parse_bound(value, end_of_day=False):
+    """Дата или дата со временем из параметра since/until."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Некорректная дата: {value}')
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def posts(author=None, group=None, since=None, until=None):
+    """
+    Посты для выгрузки по возрастанию даты. Фильтры по автору и группе
+    попадают в индексы (author, pub_date) и (group, pub_date).
+    """
+    queryset = Post.objects.order_by('pub_date', 'pk')
+    if author:
+        queryset = queryset.filter(author__username=author)
+    if group:
+        queryset = queryset.filter(group__slug=group)
+    if since:
+        queryset = queryset.filter(pub_date__gte=parse_bound(since))
+    if until:
+        queryset = queryset.filter(
+            pub_date__lte=parse_bound(until, end_of_day=True)
+        )
+    return queryset.values_list(
+        'pk', 'author__username', 'group__slug', 'pub_date', 'text',
+        'image', 'comments_count'
+    )
+
+
+def records(queryset):
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        record = dict(zip(FIELDS, row))
+        record['pub_date'] = record['pub_date'].isoformat()
+        yield record
+
+
+def stream(queryset, file_format):
+    """Строки выгрузки в формате JSONL или CSV, по одной на пост."""
+    if file_format == CSV:
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS)
+        for record in records(queryset):
+            yield writer.writerow(
+                '' if record[field] is None else record[field]
+                for field in FIELDS
+            )
+        return
+    for record in records(queryset):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
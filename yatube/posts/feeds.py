@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.db.models import Max
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from .middleware import query_budget
+from .models import Group, Post, User
+from .page_cache import page_version
+
+TITLE_WORDS = 8
+
+
+def newest(request, scope, value):
+    """
+    Дата самого свежего поста ленты. Запоминается на запросе: её
+    спрашивают и для ETag, и для Last-Modified.
+    """
+    cached = getattr(request, '_newest_post', None)
+    if cached is None:
+        posts = Post.objects.all()
+        if scope == 'group':
+            posts = posts.filter(group__slug=value)
+        elif scope == 'profile':
+            posts = posts.filter(author__username=value)
+        cached = request._newest_post = (
+            posts.aggregate(newest=Max('pub_date'))['newest'],
+        )
+    return cached[0]
+
+
+def conditional(scope, kwarg=None):
+    """
+    Отвечает 304 до построения ленты, если не изменились ни дата
+    последнего поста, ни версия страниц scope: правки и удаления
+    постов дату не двигают, но версию сбрасывают.
+    """
+    def value(kwargs):
+        return kwargs[kwarg] if kwarg else ''
+
+    def last_modified(request, **kwargs):
+        return newest(request, scope, value(kwargs))
+
+    def etag(request, **kwargs):
+        date = newest(request, scope, value(kwargs))
+        if date is None:
+            return None
+        return f'{date.timestamp()}-{page_version(scope, value(kwargs))}'
+
+    def decorator(feed):
+        return query_budget(4)(
+            condition(etag_func=etag, last_modified_func=last_modified)(feed)
+        )
+    return decorator
+
+
+class PostsFeed(Feed):
+    description = 'Новые записи Yatube'
+
+    def items(self, obj=None):
+        return self.posts(obj).select_related('author').order_by(
+            '-pub_date', '-pk'
+        )[:settings.FEED_ITEMS]
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def item_title(self, item):
+        return Truncator(item.text).words(TITLE_WORDS)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=(item.pk,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние обновления'
+
+    def link(self):
+        return reverse('posts:index')
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def link(self, obj):
+        return reverse('posts:group_posts', args=(obj.slug,))
+
+    def description(self, obj):
+        return obj.description
+
+
+class ProfileFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+    def title(self, obj):
+        return f'Yatube: записи {obj.get_full_name() or obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=(obj.username,))
+
+
+class AtomIndexFeed(IndexFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
+
+
+class AtomGroupFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return obj.description
+
+
+class AtomProfileFeed(ProfileFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
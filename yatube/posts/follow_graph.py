@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Follow
+from .versions import after_commit, bump, stamp
+
+# Общая версия графа: массовая вставка подписок без сигналов сбрасывает
+# все записи разом.
+GRAPH = ('follow_graph', 'all')
+
+
+def graph_key(user_id):
+    return f'follow_graph:{stamp(GRAPH)}:{user_id}'
+
+
+def heavy_key():
+    return f'follow_graph:{stamp(GRAPH)}:heavy'
+
+
+def get(user_id):
+    """
+    Подписки пользователя: {'following': frozenset id авторов,
+    'followers': число подписчиков}. Хранится в кэше до изменения.
+    """
+    key = graph_key(user_id)
+    graph = cache.get(key)
+    if graph is None:
+        graph = {
+            'following': frozenset(Follow.objects.filter(
+                user_id=user_id
+            ).values_list('author_id', flat=True)),
+            'followers': Follow.objects.filter(author_id=user_id).count(),
+        }
+        cache.set(key, graph, settings.FOLLOW_GRAPH_TIMEOUT)
+    return graph
+
+
+def is_following(user_id, author_id):
+    return author_id in get(user_id)['following']
+
+
+def is_heavy(author_id):
+    return get(author_id)['followers'] > settings.TIMELINE_FANOUT_LIMIT
+
+
+def heavy_authors():
+    """Авторы, у которых подписчиков больше TIMELINE_FANOUT_LIMIT."""
+    key = heavy_key()
+    authors = cache.get(key)
+    if authors is None:
+        authors = frozenset(
+            Follow.objects.values('author').annotate(
+                followers=Count('id')
+            ).filter(
+                followers__gt=settings.TIMELINE_FANOUT_LIMIT
+            ).values_list('author', flat=True)
+        )
+        cache.set(key, authors, settings.FOLLOW_GRAPH_TIMEOUT)
+    return authors
+
+
+def heavy_following(user_id):
+    """Тяжёлые авторы среди подписок пользователя."""
+    following = get(user_id)['following']
+    if not following:
+        return []
+    return sorted(following & heavy_authors())
+
+
+def invalidate(*user_ids):
+    after_commit(
+        cache.delete_many, [graph_key(user_id) for user_id in user_ids]
+    )
+
+
+def invalidate_all():
+    bump(*GRAPH)
+
+
+def follow_changed(user_id, author_id):
+    """
+    Сбрасывает графы подписчика и автора. Если автор только что
+    пересёк порог тяжёлого, сбрасывается и список тяжёлых авторов.
+    """
+    invalidate(user_id, author_id)
+    if get(author_id)['followers'] in (
+        settings.TIMELINE_FANOUT_LIMIT, settings.TIMELINE_FANOUT_LIMIT + 1
+    ):
+        after_commit(cache.delete, heavy_key())
@@ -0,0 +1,247 @@
+import csv
+import json
+import time
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, timeline
+from .dataset import explicit_dates
+from .models import Comment, Group, ImportCheckpoint, Post, User
+from .page_cache import invalidate_all
+from .versions import after_commit, touch
+
+POSTS = 'posts'
+COMMENTS = 'comments'
+
+
+class Rejected(ValueError):
+    pass
+
+
+def read_lines(path, offset):
+    """Строки файла с байтовым смещением конца каждой строки."""
+    with open(path, 'rb') as source:
+        source.seek(offset)
+        for line in source:
+            offset += len(line)
+            yield line.decode('utf-8'), offset
+
+
+def jsonl_records(path, offset):
+    for line, end in read_lines(path, offset):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield Rejected(f'некорректный JSON: {error}'), end
+            continue
+        if not isinstance(record, dict):
+            yield Rejected('запись должна быть объектом'), end
+            continue
+        yield record, end
+
+
+def csv_records(path, offset):
+    """
+    Читает CSV с заголовком. Запись может занимать несколько строк,
+    поэтому смещение берётся после того, как reader вернул запись.
+    """
+    header = None
+    if offset:
+        with open(path, encoding='utf-8', newline='') as source:
+            header = next(csv.reader(source), None)
+    end = offset
+
+    def lines():
+        nonlocal end
+        for line, end in read_lines(path, offset):
+            yield line
+
+    for row in csv.DictReader(lines(), fieldnames=header):
+        yield row, end
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    try:
+        # Дата по формату, но вне календаря — ValueError, не строка —
+        # TypeError.
+        parsed = parse_datetime(value)
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None:
+        raise Rejected(f'некорректная дата: {value}')
+    return parsed
+
+
+class Importer:
+    """
+    Потоковый импорт постов или комментариев из JSONL или CSV.
+
+    Авторы и группы ищутся по словарям username -> pk и slug -> pk,
+    загруженным один раз; остальная память ограничена пачкой. Каждая
+    пачка коммитится вместе со счётчиками своих авторов, групп и постов
+    и с контрольной точкой (ImportCheckpoint) — смещением во входном
+    файле, с которого продолжается прерванный импорт.
+    """
+
+    def __init__(self, kind, path, batch_size=500, checkpoint=None,
+                 rejects=None, report=None):
+        self.kind = kind
+        self.path = path
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint or path
+        self.rejects = rejects
+        self.report = report or (lambda message: None)
+        self.records = (
+            csv_records if path.endswith('.csv') else jsonl_records
+        )
+
+    def load_checkpoint(self):
+        checkpoint = ImportCheckpoint.objects.filter(
+            name=self.checkpoint
+        ).values('offset', 'imported', 'rejected').first()
+        return checkpoint or {'offset': 0, 'imported': 0, 'rejected': 0}
+
+    def save_checkpoint(self, state):
+        ImportCheckpoint.objects.update_or_create(
+            name=self.checkpoint, defaults=state
+        )
+
+    def run(self, resume=False):
+        state = self.load_checkpoint() if resume else {
+            'offset': 0, 'imported': 0, 'rejected': 0
+        }
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        rejects = open(
+            self.rejects, 'a' if resume else 'w', encoding='utf-8'
+        ) if self.rejects else None
+        started = time.perf_counter()
+        processed = 0
+        batch = []
+        end = state['offset']
+        try:
+            with explicit_dates():
+                for record, end in self.records(self.path, state['offset']):
+                    processed += 1
+                    try:
+                        if isinstance(record, Rejected):
+                            raise record
+                        batch.append((self.build(record), record))
+                    except Rejected as error:
+                        state['rejected'] += 1
+                        self.reject(rejects, record, error)
+                    if len(batch) >= self.batch_size:
+                        self.flush(batch, state, rejects, end)
+                        batch = []
+                        self.progress(state, processed, started)
+                self.flush(batch, state, rejects, end)
+        finally:
+            if rejects:
+                rejects.close()
+        ImportCheckpoint.objects.filter(name=self.checkpoint).delete()
+        invalidate_all()
+        elapsed = time.perf_counter() - started
+        return state, processed / elapsed if elapsed else 0
+
+    def progress(self, state, processed, started):
+        elapsed = time.perf_counter() - started
+        self.report(
+            f'Импортировано: {state["imported"]}, '
+            f'отклонено: {state["rejected"]}, '
+            f'{processed / elapsed:.0f} строк/с'
+        )
+
+    def reject(self, rejects, record, error):
+        if rejects is None:
+            return
+        if isinstance(record, Rejected):
+            record = None
+        rejects.write(json.dumps(
+            {'error': str(error), 'record': record}, ensure_ascii=False
+        ) + '\n')
+
+    def lookup(self, mapping, value, name):
+        try:
+            return mapping[value]
+        except (KeyError, TypeError):
+            raise Rejected(f'неизвестный {name}: {value}')
+
+    def build(self, record):
+        text = str(record.get('text') or '').strip()
+        if not text:
+            raise Rejected('пустой текст')
+        author_id = self.lookup(self.authors, record.get('author'), 'автор')
+        if self.kind == POSTS:
+            group = record.get('group')
+            return Post(
+                text=text,
+                author_id=author_id,
+                group_id=(
+                    self.lookup(self.groups, group, 'группа')
+                    if group else None
+                ),
+                pub_date=parse_date(record.get('pub_date')),
+                image=record.get('image') or '',
+            )
+        try:
+            post_id = int(record.get('post'))
+        except (TypeError, ValueError):
+            raise Rejected(f'некорректный пост: {record.get("post")}')
+        return Comment(
+            text=text,
+            author_id=author_id,
+            post_id=post_id,
+            created=parse_date(record.get('created')),
+        )
+
+    def flush(self, batch, state, rejects, end):
+        """Коммитит пачку, её счётчики и контрольную точку на end."""
+        if self.kind == COMMENTS and batch:
+            existing = set(Post.objects.filter(
+                pk__in={obj.post_id for obj, _ in batch}
+            ).values_list('pk', flat=True))
+            for obj, record in batch:
+                if obj.post_id not in existing:
+                    state['rejected'] += 1
+                    self.reject(
+                        rejects, record, Rejected(
+                            f'неизвестный пост: {obj.post_id}'
+                        )
+                    )
+            batch = [item for item in batch if item[0].post_id in existing]
+        objects = [obj for obj, _ in batch]
+        with transaction.atomic():
+            if self.kind == POSTS and objects:
+                last_pk = Post.objects.aggregate(
+                    last=Max('pk')
+                )['last'] or 0
+                Post.objects.bulk_create(objects)
+                timeline.fan_out_after(last_pk)
+                self.count(counters.change_author_posts, objects, 'author_id')
+                self.count(counters.change_group_posts, objects, 'group_id')
+            elif objects:
+                Comment.objects.bulk_create(objects)
+                self.count(counters.change_post_comments, objects, 'post_id')
+                after_commit(
+                    touch, *{('post', obj.post_id) for obj in objects}
+                )
+            state['offset'] = end
+            state['imported'] += len(objects)
+            self.save_checkpoint(state)
+
+    def count(self, change, objects, field):
+        """Прибавляет к счётчикам число новых объектов по полю field."""
+        for pk, delta in Counter(
+            getattr(obj, field) for obj in objects
+        ).items():
+            change(pk, delta)
@@ -0,0 +1,60 @@
+from . import follow_graph
+from .models import Post, Timeline
+from .utils import CURSOR_PREVIOUS, encode_cursor
+
+INDEX = 'index'
+FOLLOW = 'follow'
+
+
+def since_token(post):
+    """Позиция поста, после которой искать новые записи."""
+    return encode_cursor(CURSOR_PREVIOUS, post.pub_date, post.pk)
+
+
+def newer(rows, date, pk):
+    return [row for row in rows if row > (date, pk)]
+
+
+def newer_positions(user, date, pk, limit):
+    """
+    Пары (pub_date, pk) записей новее позиции, по возрастанию, не больше
+    limit. Читается только индекс по дате: (pub_date) для главной,
+    (user, pub_date, post) ленты и (author, pub_date) тяжёлых авторов
+    для подписок. Условие >= вместо пары OR оставляет поиск по диапазону
+    индекса; саму позицию и её ровесников отсекаем уже здесь.
+    """
+    if user is None:
+        rows = list(Post.objects.filter(pub_date__gte=date).order_by(
+            'pub_date', 'pk'
+        ).values_list('pub_date', 'pk')[:limit + 1])
+        return newer(rows, date, pk)[:limit]
+    rows = list(Timeline.objects.filter(
+        user=user, pub_date__gte=date
+    ).order_by('pub_date', 'post_id').values_list(
+        'pub_date', 'post_id'
+    )[:limit + 1])
+    heavy = follow_graph.heavy_following(user.pk)
+    if heavy:
+        rows += Post.objects.filter(
+            author__in=heavy, pub_date__gte=date
+        ).order_by('pub_date', 'pk').values_list(
+            'pub_date', 'pk'
+        )[:limit + 1]
+    return sorted(set(newer(rows, date, pk)))[:limit]
+
+
+def new_posts(user, date, pk, limit):
+    """
+    Посты новее позиции, свежие сверху, и признак, что их больше limit:
+    тогда страницу проще перезагрузить, и посты не читаются. Если новых
+    нет, это один запрос по индексу.
+    """
+    positions = newer_positions(user, date, pk, limit + 1)
+    if not positions or len(positions) > limit:
+        return [], bool(positions)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for _, pk in positions]
+    )
+    return [
+        posts[pk] for _, pk in reversed(positions) if pk in posts
+    ], False
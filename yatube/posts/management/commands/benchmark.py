@@ -0,0 +1,148 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.cache import isolated_caches
+from posts import benchmark
+
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment', 'mixed',
+)
+# Настройки SQLite по умолчанию: журнал DELETE, synchronous=FULL,
+# отложенный BEGIN и новое соединение на каждый запрос.
+BASELINE_SQLITE = {
+    'OPTIONS': {
+        'timeout': 5,
+        'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    },
+    'CONN_MAX_AGE': 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер страниц постов на отдельной тестовой базе: '
+        'перцентили задержки, запросы к БД и пиковая память'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=200)
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 16],
+            help='Уровни параллельности: число потоков с клиентами'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов на сценарий при каждом уровне параллельности'
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Сценарий для замера; по умолчанию все'
+        )
+        parser.add_argument(
+            '--compare-sqlite', action='store_true',
+            help='Сначала замер с настройками SQLite по умолчанию, затем '
+                 'с настройками из DATABASES'
+        )
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Файл для результатов в формате JSON'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < max(options['concurrency'] + [2]):
+            raise CommandError(
+                'Пользователей должно быть не меньше уровня параллельности'
+            )
+        if options['compare_sqlite']:
+            results = {
+                'baseline': self.measure_in_workdir(options, BASELINE_SQLITE),
+                'tuned': self.measure_in_workdir(options, {}),
+            }
+        else:
+            results = self.measure_in_workdir(options, {})
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
+
+    def measure_in_workdir(self, options, sqlite):
+        """
+        Замер на свежей базе во временном каталоге. sqlite подменяет
+        ключи настроек соединения default на время замера.
+        """
+        workdir = tempfile.mkdtemp(prefix='yatube-bench-')
+        saved = {key: connection.settings_dict[key] for key in sqlite}
+        connection.settings_dict.update(sqlite)
+        # Потоки открывают собственные соединения, поэтому база нужна
+        # в файле: общая база в памяти блокируется при записи.
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            workdir, 'bench.sqlite3'
+        )
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with override_settings(
+                CACHES=isolated_caches(workdir),
+                MEDIA_ROOT=os.path.join(workdir, 'media'),
+                QUERY_BUDGET_STRICT=False,
+                RATE_LIMITS={},
+                THUMBNAIL_WORKERS=0,
+            ):
+                return self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict.update(saved)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def measure(self, options):
+        dataset = {
+            name: options[name] for name in (
+                'users', 'groups', 'posts', 'comments', 'follows', 'images'
+            )
+        }
+        benchmark.seed(**dataset)
+        chosen = options['scenario'] or SCENARIOS
+        runs = []
+        for scenario in benchmark.default_scenarios():
+            if scenario.name not in chosen:
+                continue
+            for concurrency in options['concurrency']:
+                result = benchmark.run(
+                    scenario, concurrency, options['requests']
+                )
+                runs.append(result)
+                self.stdout.write(
+                    '{scenario:<14} x{concurrency:<3} p50={p50_ms}ms '
+                    'p95={p95_ms}ms p99={p99_ms}ms '
+                    'queries={queries_avg} cache={cache_hit_rate} '
+                    'rps={throughput_rps} errors={errors} '
+                    'locked={locked}'.format(**result)
+                )
+        return {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': dataset,
+            'requests': options['requests'],
+            'runs': runs,
+        }
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка постов в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', dest='file_format', choices=tuple(export.FORMATS),
+            default=export.JSONL
+        )
+        parser.add_argument('--author', help='Username автора')
+        parser.add_argument('--group', help='Slug группы')
+        parser.add_argument('--since', help='Не раньше даты, ГГГГ-ММ-ДД')
+        parser.add_argument('--until', help='Не позже даты, ГГГГ-ММ-ДД')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            posts = export.posts(
+                author=options['author'],
+                group=options['group'],
+                since=options['since'],
+                until=options['until'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        output = open(
+            options['output'], 'w', encoding='utf-8', newline=''
+        ) if options['output'] else None
+        total = 0
+        try:
+            for line in export.stream(posts, options['file_format']):
+                if output:
+                    output.write(line)
+                else:
+                    self.stdout.write(line, ending='')
+                total += 1
+        finally:
+            if output:
+                output.close()
+        self.stderr.write(f'Выгружено строк: {total}')
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import peak_rss_kb
+from posts.dataset import Generator
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетический набор данных: авторы с разной '
+        'популярностью, степенной граф подписок, всплески комментариев'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10 ** 6)
+        parser.add_argument(
+            '--users', type=int,
+            help='Число пользователей; по умолчанию — сотая часть постов'
+        )
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--follow-scale', type=float, default=3.0,
+            help='Множитель числа подписок на пользователя'
+        )
+        parser.add_argument(
+            '--comments', type=float, default=2.0,
+            help='Среднее число комментариев под обычным постом'
+        )
+        parser.add_argument(
+            '--bursts', type=float, default=0.01,
+            help='Доля постов со всплеском комментариев'
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = Generator(
+            users=options['users'] or max(options['posts'] // 100, 2),
+            groups=options['groups'],
+            posts=options['posts'],
+            follow_scale=options['follow_scale'],
+            comments=options['comments'],
+            bursts=options['bursts'],
+            images=options['images'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            report=self.stdout.write,
+        )
+        rows, elapsed = generator.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {rows} за {elapsed:.1f} с, '
+            f'пиковая память: {peak_rss_kb()} КБ'
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import COMMENTS, POSTS, Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт постов или комментариев из JSONL или CSV '
+        'с контрольными точками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument(
+            '--kind', choices=(POSTS, COMMENTS), default=POSTS,
+            help='Что импортировать: посты или комментарии'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с последней контрольной точки'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Имя контрольной точки; по умолчанию путь к файлу'
+        )
+        parser.add_argument(
+            '--rejects', help='Куда записать отклонённые строки (JSONL)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            state, rate = Importer(
+                options['kind'],
+                options['path'],
+                batch_size=options['batch_size'],
+                checkpoint=options['checkpoint'],
+                rejects=options['rejects'],
+                report=self.stdout.write,
+            ).run(resume=options['resume'])
+        except OSError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {state["imported"]}, '
+            f'отклонено: {state["rejected"]}, {rate:.0f} строк/с'
+        ))
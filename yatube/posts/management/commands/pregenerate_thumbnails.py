@@ -0,0 +1,44 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заранее строит миниатюры для всех картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число процессов; 0 — строить в текущем процессе'
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).order_by().distinct().iterator()
+        if options['workers']:
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=thumbnails.init_worker,
+            )
+            with pool:
+                self.report(pool.map(thumbnails.generate, names, chunksize=16))
+        else:
+            self.report(map(thumbnails.generate, names))
+
+    def report(self, results):
+        total = failed = 0
+        for name, error in results:
+            total += 1
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {total}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('posts.query_budget')
+_state = threading.local()
+# Служебные команды транзакций не считаются запросами.
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO'
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(queries):
+    """Объявляет, сколько SQL-запросов view может сделать за запрос."""
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+class QueryCounter:
+    def __init__(self, ignored_tables=()):
+        self.queries = []
+        self.duration = 0.0
+        self.ignored = tuple(f'"{table}"' for table in ignored_tables)
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(TRANSACTION_STATEMENTS) or any(
+            table in sql for table in self.ignored
+        ):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries.append(sql)
+
+
+def active_counters():
+    """Счётчики, подключённые в текущем потоке."""
+    return getattr(_state, 'counters', ())
+
+
+@contextmanager
+def counting(*counters):
+    """
+    Подключает счётчики ко всем базам: чтения могут уйти на реплику.
+    Поток-писатель подключает счётчики запроса, от имени которого пишет.
+    """
+    previous = active_counters()
+    _state.counters = previous + counters
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                for counter in counters:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(counter)
+                    )
+            yield
+    finally:
+        _state.counters = previous
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает запросы к БД и время на них для view с объявленным бюджетом.
+    При превышении в режиме QUERY_BUDGET_STRICT бросает исключение со
+    списком SQL, иначе пишет предупреждение в лог.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter(settings.QUERY_BUDGET_IGNORED_TABLES)
+        with counting(counter):
+            response = self.get_response(request)
+        match = request.resolver_match
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        if budget is not None and len(counter.queries) > budget:
+            self.report(request, match.view_name, budget, counter)
+        return response
+
+    def report(self, request, view_name, budget, counter):
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                f'{view_name}: {len(counter.queries)} запросов при бюджете '
+                f'{budget}\n' + '\n'.join(counter.queries)
+            )
+        logger.warning(
+            'query budget exceeded',
+            extra={
+                'view': view_name,
+                'path': request.path,
+                'budget': budget,
+                'queries': len(counter.queries),
+                'db_time_ms': round(counter.duration * 1000, 2),
+            },
+        )
@@ -0,0 +1,66 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+import django.utils.timezone
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for row in duplicates:
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(id=row['first']).delete()
+
+
+def fill_timeline_dates(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Timeline = apps.get_model('posts', 'Timeline')
+    Timeline.objects.update(pub_date=Subquery(
+        Post.objects.filter(pk=OuterRef('post')).values('pub_date')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='timeline',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата публикации'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_timeline_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='timeline_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=500, unique=True, verbose_name='Имя')),
+                ('offset', models.BigIntegerField(verbose_name='Смещение во входном файле')),
+                ('imported', models.PositiveIntegerField(verbose_name='Импортировано')),
+                ('rejected', models.PositiveIntegerField(verbose_name='Отклонено')),
+            ],
+            options={
+                'verbose_name': 'контрольную точку импорта',
+                'verbose_name_plural': 'Контрольные точки импорта',
+            },
+        ),
+    ]
@@ -8,6 +8,11 @@ class Group(models.Model):
     title = models.CharField('Группа', max_length=200)
     slug = models.SlugField('Подсайт', unique=True)
     description = models.TextField('Описание')
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'группу'
@@ -46,9 +51,23 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('pub_date',), name='post_pub_date_idx'),
+            models.Index(
+                fields=('author', 'pub_date'), name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=('group', 'pub_date'), name='post_group_date_idx'
+            ),
+        )
         verbose_name = 'пост'
         verbose_name_plural = 'Посты'
 
@@ -80,6 +99,11 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created'), name='comment_post_created_idx'
+            ),
+        )
         verbose_name = 'комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -100,3 +124,67 @@ class Follow(models.Model):
         verbose_name='Автор поста',
         on_delete=models.CASCADE,
     )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'
+            ),
+        )
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline',
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_date_idx'
+            ),
+        )
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+
+class AuthorCounter(models.Model):
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='counter',
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+
+    class Meta:
+        verbose_name = 'счётчик автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Позиция прерванного импорта. Пишется в той же транзакции, что и
+    пачка записей, поэтому продолжение не повторяет закоммиченное.
+    """
+    name = models.CharField('Имя', max_length=500, unique=True)
+    offset = models.BigIntegerField('Смещение во входном файле')
+    imported = models.PositiveIntegerField('Импортировано')
+    rejected = models.PositiveIntegerField('Отклонено')
+
+    class Meta:
+        verbose_name = 'контрольную точку импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
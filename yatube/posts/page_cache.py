@@ -0,0 +1,117 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from .models import Group, Post, User
+from .versions import bump, stamp, versions
+
+# Общая версия всех страниц: имена авторов и названия групп видны везде.
+ALL_PAGES = ('pages', 'all')
+
+
+def page_version(scope, value=''):
+    return stamp(ALL_PAGES, (scope, value))
+
+
+def cache_anonymous_page(scope, kwarg=None):
+    """
+    Кэширует ответ view целиком для анонимных GET-запросов. Ключ —
+    путь с параметрами плюс версии страницы (scope, значение kwarg)
+    и ALL_PAGES.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            version = page_version(scope, kwargs[kwarg] if kwarg else '')
+            path = hashlib.md5(
+                request.get_full_path().encode()
+            ).hexdigest()
+            key = f'page:{path}:{version}'
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(dependencies):
+    """
+    ETag и Last-Modified для страницы по версиям её зависимостей.
+    dependencies(request, **kwargs) возвращает пары (kind, pk) или None,
+    если проверять нечего. Версии — время изменения, поэтому самая
+    свежая из них и есть Last-Modified. В ETag входят пользователь и
+    CSRF-cookie: от них зависит разметка. Совпадение отвечает 304 ещё
+    до запросов и шаблонов самой view.
+    """
+    def fingerprint(request, kwargs):
+        if not hasattr(request, '_page_fingerprint'):
+            objects = dependencies(request, **kwargs)
+            if objects is None:
+                request._page_fingerprint = None, None
+            else:
+                found = versions(ALL_PAGES, *objects)
+                viewer = (
+                    f'{request.user.pk}:{request.META.get("CSRF_COOKIE", "")}'
+                )
+                request._page_fingerprint = (
+                    hashlib.md5(
+                        f'{viewer}:{found}'.encode()
+                    ).hexdigest(),
+                    datetime.fromtimestamp(
+                        max(found) / 10 ** 9, timezone.utc
+                    ),
+                )
+        return request._page_fingerprint
+
+    def etag(request, *args, **kwargs):
+        return fingerprint(request, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return fingerprint(request, kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def invalidate_all():
+    bump(*ALL_PAGES)
+
+
+def invalidate_profile(*user_ids):
+    """Сбрасывает профили пользователей; один запрос на всех."""
+    for username in User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True
+    ):
+        bump('profile', username)
+
+
+def invalidate_posts(author_id, group_ids):
+    """Сбрасывает страницы, на которых виден пост автора в группах."""
+    bump('index', '')
+    invalidate_profile(author_id)
+    group_ids = [pk for pk in group_ids if pk is not None]
+    if group_ids:
+        for slug in Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True
+        ):
+            bump('group', slug)
+
+
+def posts_pages(post_ids):
+    """Пары (kind, pk) страниц, на которых видны посты; один запрос."""
+    pages = {('index', '')}
+    for username, slug in Post.objects.filter(pk__in=post_ids).values_list(
+        'author__username', 'group__slug'
+    ):
+        pages.add(('profile', username))
+        if slug is not None:
+            pages.add(('group', slug))
+    return pages
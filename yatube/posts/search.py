@@ -0,0 +1,91 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .utils import CURSOR_NEXT, CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+SNIPPET_WORDS = 24
+# Управляющие символы не встречаются в тексте постов, поэтому ими удобно
+# размечать совпадения до экранирования HTML.
+MARK_OPEN = '\x02'
+MARK_CLOSE = '\x03'
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в безопасное выражение FTS5 MATCH."""
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(MARK_OPEN, '<mark>').replace(
+            MARK_CLOSE, '</mark>'
+        )
+    )
+
+
+def matching_ids(expression):
+    """Подзапрос rowid постов, подходящих под выражение; для filter()."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (expression,)
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """
+    Курсорная пагинация по релевантности bm25. Позиция — пара
+    (rank, rowid); меньший rank у FTS5 означает лучшее совпадение.
+    """
+
+    value_type = float
+
+    def __init__(self, expression, per_page):
+        super().__init__(expression, per_page, ('rank', 'pk'))
+
+    def _fetch(self, position, limit):
+        sql = (
+            f'SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [MARK_OPEN, MARK_CLOSE, '…', SNIPPET_WORDS, self.object_list]
+        if position is None or position[0] == CURSOR_NEXT:
+            order = 'ORDER BY rank, rowid DESC'
+            boundary = ' AND (rank > %s OR (rank = %s AND rowid < %s))'
+        else:
+            order = 'ORDER BY rank DESC, rowid'
+            boundary = ' AND (rank < %s OR (rank = %s AND rowid > %s))'
+        if position is not None:
+            _, rank, pk = position
+            sql += boundary
+            params += [rank, rank, pk]
+        sql += f' {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [row[0] for row in rows]
+        )
+        results = []
+        for pk, rank, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+
+def search(query, cursor, per_page):
+    """Страница результатов поиска или None для пустого запроса."""
+    expression = match_expression(query)
+    if not expression:
+        return None
+    return SearchPaginator(expression, per_page).get_cursor_page(cursor)
@@ -0,0 +1,147 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from . import counters, follow_graph, page_cache, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+from .versions import bump, pending_until_commit, touch
+
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+_deleting = threading.local()
+
+
+def deleting_posts():
+    """Посты, которые удаляются в этом потоке прямо сейчас."""
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+def image_name(post):
+    # До первого обращения в __dict__ лежит строка, после — FieldFile.
+    image = post.__dict__.get('image')
+    return getattr(image, 'name', image) or ''
+
+
+def invalidate_post_pages(post_ids):
+    touch(
+        *(('post', pk) for pk in post_ids),
+        *page_cache.posts_pages(post_ids),
+    )
+
+
+def post_pages_changed(post_id):
+    """
+    Сбрасывает карточку и страницы поста. В транзакции — сразу лишь
+    при первом изменении поста, а после коммита одним проходом по всем.
+    """
+    if post_id in deleting_posts():
+        return
+    pending = pending_until_commit(invalidate_post_pages)
+    if pending is None or post_id not in pending:
+        invalidate_post_pages({post_id})
+    if pending is not None:
+        pending.add(post_id)
+
+
+@receiver(post_init, sender=Post)
+def post_remember_group(sender, instance, **kwargs):
+    # Через __dict__, чтобы отложенное поле не вызывало лишний запрос.
+    instance._counted_group_id = instance.__dict__.get('group_id')
+    instance._thumbnailed_image = image_name(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = instance._counted_group_id
+    group_id = instance.__dict__.get('group_id', old_group_id)
+    if created:
+        timeline.fan_out(instance)
+        counters.change_author_posts(instance.author_id, 1)
+        counters.change_group_posts(group_id, 1)
+    elif old_group_id != group_id:
+        counters.change_group_posts(old_group_id, -1)
+        counters.change_group_posts(group_id, 1)
+    instance._counted_group_id = group_id
+    name = image_name(instance)
+    if name and name != instance._thumbnailed_image:
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+    instance._thumbnailed_image = name
+    bump('post', instance.pk)
+    page_cache.invalidate_posts(instance.author_id, {old_group_id, group_id})
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # Комментарии удаляются каскадом раньше поста, а счётчик и страницы
+    # поста post_deleted сбрасывает сам.
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    counters.change_author_posts(instance.author_id, -1)
+    counters.change_group_posts(instance.group_id, -1)
+    bump('post', instance.pk)
+    page_cache.invalidate_posts(instance.author_id, {instance.group_id})
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post_comments(instance.post_id, 1)
+    post_pages_changed(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    counters.change_post_comments(instance.post_id, -1)
+    post_pages_changed(instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump('group', instance.pk)
+    page_cache.invalidate_all()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or CARD_USER_FIELDS & set(update_fields):
+        bump('author', instance.pk)
+        page_cache.invalidate_all()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # Подписки удаляются каскадом раньше и сбрасывают графы остальных.
+    follow_graph.invalidate(instance.pk)
+    page_cache.invalidate_all()
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    follow_graph.follow_changed(instance.user_id, instance.author_id)
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+    bump('follows', instance.user_id)
+    counters.forget_count('follow', instance.user_id)
+    page_cache.invalidate_profile(instance.author_id, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_cleanup(sender, instance, **kwargs):
+    follow_graph.follow_changed(instance.user_id, instance.author_id)
+    timeline.cleanup(instance.user_id, instance.author_id)
+    bump('follows', instance.user_id)
+    counters.forget_count('follow', instance.user_id)
+    page_cache.invalidate_profile(instance.author_id, instance.user_id)
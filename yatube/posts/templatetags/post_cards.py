@@ -0,0 +1,25 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_card
+from posts.live import since_token
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post, show_author=False, show_group=False):
+    return mark_safe(render_card(post, show_author, show_group))
+
+
+@register.filter
+def since_cursor(page_obj):
+    """Курсор для опроса новых постов; только на первой странице."""
+    first_page = (
+        page_obj.cursor is None
+        if getattr(page_obj.paginator, 'is_cursor', False)
+        else page_obj.number == 1
+    )
+    if not first_page or not page_obj.object_list:
+        return ''
+    return since_token(page_obj[0])
@@ -0,0 +1,152 @@
+import warnings
+
+from django.core.cache import cache
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CURSOR_NEXT, encode_cursor
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.auth, group=cls.group
+            )
+            for number in range(15)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.auth)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_posts_cursor(self):
+        """Тест: посты отдаются страницами по курсору без повторов"""
+        url = reverse('posts:api_posts')
+        data = self.client.get(url, {'limit': 10}).json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(data['results'][0]['text'], 'Пост 14')
+        self.assertIsNone(data['previous'])
+        rest = self.client.get(
+            url, {'limit': 10, 'cursor': data['next']}
+        ).json()
+        self.assertEqual(len(rest['results']), 5)
+        self.assertIsNone(rest['next'])
+        ids = [post['id'] for post in data['results'] + rest['results']]
+        self.assertEqual(len(set(ids)), 15)
+
+    def test_cursor_of_wrong_type(self):
+        """Тест: числовой курсор для постов — как битый"""
+        data = self.client.get(reverse('posts:api_posts'), {
+            'limit': 10, 'cursor': encode_cursor(CURSOR_NEXT, 1.5, 3)
+        }).json()
+        self.assertEqual(data['results'][0]['text'], 'Пост 14')
+        self.assertIsNone(data['previous'])
+
+    def test_sparse_fields(self):
+        """Тест: без поля text колонка text не читается"""
+        url = reverse('posts:api_posts')
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url, {'fields': 'id,author'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        self.assertEqual(data['results'][0]['author'], self.auth.pk)
+        self.assertFalse(any(
+            '"posts_post"."text"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_expand_without_n_plus_one(self):
+        """Тест: автор и группа подгружаются одним запросом на связь"""
+        url = reverse('posts:api_posts')
+        with self.assertNumQueries(3):
+            data = self.client.get(url, {'expand': 'author,group'}).json()
+        post = data['results'][0]
+        self.assertEqual(post['author'], {
+            'id': self.auth.pk, 'username': 'auth', 'full_name': 'Лев Толстой'
+        })
+        self.assertEqual(post['group']['slug'], 'test-slug')
+
+    def test_items_and_filters(self):
+        """Тест: отдельные объекты, комментарии, группы и фильтры"""
+        post = self.client.get(
+            reverse('posts:api_post', args=(self.posts[0].pk,)),
+            {'fields': 'text,comments_count'},
+        ).json()
+        self.assertEqual(post, {'text': 'Пост 0', 'comments_count': 1})
+        comments = self.client.get(
+            reverse('posts:api_comments', args=(self.posts[0].pk,)),
+            {'expand': 'author'},
+        ).json()['results']
+        self.assertEqual(comments[0]['author']['username'], 'reader')
+        groups = self.client.get(reverse('posts:api_groups')).json()
+        self.assertEqual(groups['results'][0]['posts_count'], 15)
+        group = self.client.get(
+            reverse('posts:api_group', args=('test-slug',))
+        ).json()
+        self.assertEqual(group['title'], 'Тестовая группа')
+        filtered = self.client.get(
+            reverse('posts:api_posts'), {'author': 'reader'}
+        ).json()
+        self.assertEqual(filtered['results'], [])
+
+    def test_groups_cursor(self):
+        """Тест: группы листаются по pk, курсор с датой — как битый"""
+        Group.objects.create(title='Вторая', slug='second', description='')
+        url = reverse('posts:api_groups')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            first = self.client.get(url, {'limit': 1}).json()
+        self.assertEqual(first['results'][0]['slug'], 'second')
+        rest = self.client.get(
+            url, {'limit': 1, 'cursor': first['next']}
+        ).json()
+        self.assertEqual(rest['results'][0]['slug'], 'test-slug')
+        self.assertIsNone(rest['next'])
+        with CaptureQueriesContext(connection) as queries:
+            dated = self.client.get(url, {
+                'limit': 1,
+                'cursor': encode_cursor(CURSOR_NEXT, timezone.now(), 1),
+            }).json()
+        self.assertEqual(dated, first)
+        self.assertLessEqual(len(queries), 3)
+
+    def test_follow_feed(self):
+        """Тест: лента подписок доступна только авторизованным"""
+        url = reverse('posts:api_follow')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        data = self.reader_client.get(url).json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNotNone(data['next'])
+
+    def test_errors(self):
+        """Тест: неизвестное поле — 400, неизвестный объект — 404"""
+        response = self.client.get(
+            reverse('posts:api_posts'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+        response = self.client.get(reverse('posts:api_post', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('posts:api_posts'))
+        self.assertEqual(response.status_code, 405)
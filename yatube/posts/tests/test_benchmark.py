@@ -0,0 +1,64 @@
+from django.test import TestCase
+
+from posts import benchmark
+from posts.dataset import Generator
+from posts.models import AuthorCounter, Comment, Follow, Post, Timeline
+
+
+class BenchmarkTest(TestCase):
+    def test_percentile(self):
+        """Тест: перцентиль считается методом ближайшего ранга"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+        self.assertIsNone(benchmark.percentile([], 50))
+
+    def test_seed_and_run(self):
+        """Тест: замер на малом наборе данных отдаёт метрики"""
+        benchmark.seed(users=5, groups=2, posts=30, comments=40, follows=6)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Timeline.objects.exists())
+        scenarios = {
+            scenario.name: scenario
+            for scenario in benchmark.default_scenarios()
+        }
+        result = benchmark.run(scenarios['index'], 1, 5)
+        self.assertEqual(result['requests'], 5)
+        self.assertEqual(result['errors'], 0)
+        self.assertGreater(result['queries_avg'], 0)
+        self.assertGreater(result['peak_rss_kb'], 0)
+        self.assertGreater(result['cache_hit_rate'], 0)
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            self.assertGreater(result[key], 0)
+        result = benchmark.run(scenarios['mixed'], 1, 10)
+        self.assertEqual((result['errors'], result['locked']), (0, 0))
+
+
+class DatasetGeneratorTest(TestCase):
+    def test_generate(self):
+        """Тест: генератор создаёт связанный набор данных пачками"""
+        rows, _ = Generator(
+            users=20, groups=3, posts=250, batch_size=100, seed=1
+        ).run()
+        self.assertEqual(Post.objects.count(), 250)
+        self.assertTrue(Follow.objects.exists())
+        self.assertGreaterEqual(
+            rows, Post.objects.count() + Comment.objects.count()
+        )
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        follow = Follow.objects.filter(author__posts__isnull=False).first()
+        self.assertTrue(Timeline.objects.filter(
+            user_id=follow.user_id, post__author_id=follow.author_id
+        ).exists())
+        counter = AuthorCounter.objects.order_by('-posts_count').first()
+        self.assertEqual(
+            counter.posts_count,
+            Post.objects.filter(author_id=counter.author_id).count()
+        )
+        comment = Comment.objects.select_related('post').first()
+        self.assertGreaterEqual(comment.created, comment.post.pub_date)
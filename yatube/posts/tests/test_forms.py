@@ -1,11 +1,31 @@
+import shutil
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
 
 from ..forms import PostForm
-from ..models import Follow, Group, Post, User, Comment
+from ..models import Follow, Group, Post, User, Comment, Timeline
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 class PostCreateAndEditFormsTests(TestCase):
@@ -262,3 +282,124 @@ class FollowTestCase(TestCase):
             reverse('posts:follow_index')
         )
         self.assertEqual(len(response.context['page_obj']), 0)
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=1)
+class TimelineTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.auth2 = User.objects.create_user(username='auth2')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self) -> None:
+        self.auth_client = Client()
+        self.auth_client.force_login(self.auth)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def feed_ids(self, client):
+        response = client.get(reverse('posts:follow_index'))
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_post_create_fans_out_to_followers(self):
+        """Тест: новый пост попадает в материализованную ленту"""
+        Follow.objects.create(user=self.auth, author=self.author)
+        self.author_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'}
+        )
+        post = Post.objects.get(text='Новый пост')
+        self.assertTrue(
+            Timeline.objects.filter(user=self.auth, post=post).exists()
+        )
+        self.assertEqual(self.feed_ids(self.auth_client), [post.pk])
+
+    def test_follow_backfills_and_unfollow_cleans_up(self):
+        """Тест: подписка дозаполняет ленту, отписка очищает"""
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        self.auth_client.get(
+            reverse('posts:profile_follow', args=(self.author,))
+        )
+        self.assertEqual(self.feed_ids(self.auth_client), [post.pk])
+        self.auth_client.get(
+            reverse('posts:profile_unfollow', args=(self.author,))
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.auth).exists())
+        self.assertEqual(self.feed_ids(self.auth_client), [])
+
+    def test_heavy_author_merged_on_read(self):
+        """Тест: посты автора с многими подписчиками берутся при чтении"""
+        Follow.objects.create(user=self.auth, author=self.author)
+        Follow.objects.create(user=self.auth2, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        self.assertEqual(self.feed_ids(self.auth_client), [post.pk])
+        with mock.patch('posts.timeline.on_commit') as on_commit:
+            Follow.objects.filter(user=self.auth2).delete()
+        self.assertFalse(
+            Timeline.objects.filter(user=self.auth, post=post).exists()
+        )
+        with self.settings(WRITE_COORDINATOR=False):
+            on_commit.call_args[0][0]()
+        self.assertTrue(
+            Timeline.objects.filter(user=self.auth, post=post).exists()
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # sorl хранит сведения о миниатюрах в кэше, общем для всех тестов.
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_upload_schedules_thumbnails(self):
+        """Тест: загрузка картинки ставит миниатюры в очередь после
+        коммита"""
+        with mock.patch('posts.signals.transaction.on_commit') as on_commit:
+            self.author_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'С картинкой', 'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                )},
+            )
+            post = Post.objects.get(text='С картинкой')
+            post.text = 'Без новой картинки'
+            post.save()
+        self.assertEqual(on_commit.call_count, 1)
+        with mock.patch('posts.signals.thumbnails.schedule') as schedule:
+            on_commit.call_args[0][0]()
+        schedule.assert_called_once_with(post.image.name)
+
+    def test_command_pregenerates_all_presets(self):
+        """Тест: команда строит миниатюры всех размеров по разу на
+        картинку"""
+        post = Post.objects.create(
+            author=self.author,
+            text='С картинкой',
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        Post.objects.create(
+            author=self.author, text='Та же картинка', image=post.image.name
+        )
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Обработано картинок: 1, с ошибками: 0', out.getvalue())
+        keys = default.kvstore._get(
+            ImageFile(post.image).key, identity='thumbnails'
+        )
+        self.assertEqual(len(keys), len(settings.THUMBNAIL_PRESETS))
+        for key in keys:
+            with self.subTest(key=key):
+                thumbnail = default.kvstore._get(key)
+                self.assertTrue(default_storage.exists(thumbnail.name))
@@ -0,0 +1,213 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.cards import render_card
+from posts.importer import Importer
+from posts.models import (
+    AuthorCounter, Comment, Follow, Group, ImportCheckpoint, Post, User
+)
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_jsonl(self, records, lines=()):
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as target:
+            for record in records:
+                target.write(json.dumps(record, ensure_ascii=False) + '\n')
+            for line in lines:
+                target.write(line + '\n')
+        return path
+
+    def test_import_jsonl(self):
+        """Тест: посты импортируются, плохие строки отклоняются"""
+        path = self.write_jsonl([
+            {'text': 'Первый', 'author': 'author', 'group': 'test-slug',
+             'pub_date': '2020-01-01T10:00:00'},
+            {'text': 'Второй', 'author': 'author'},
+            {'text': 'Чужой', 'author': 'nobody'},
+            {'text': '', 'author': 'author'},
+            {'text': 'Не та дата', 'author': 'author',
+             'pub_date': '2024-13-45T00:00:00'},
+            {'text': 'Дата числом', 'author': 'author', 'pub_date': 2020},
+        ], lines=['{не json'])
+        rejects = os.path.join(self.directory, 'rejects.jsonl')
+        call_command(
+            'import_posts', path, batch_size=1, rejects=rejects,
+            stdout=io.StringIO()
+        )
+        post = Post.objects.get(text='Первый')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(self.reader.timeline.count(), 2)
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.author).posts_count, 2
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        with open(rejects, encoding='utf-8') as source:
+            self.assertEqual(len(source.readlines()), 5)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_csv_comments(self):
+        """Тест: комментарии из CSV, текст может занимать несколько строк"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertIn('Комментариев: 0', render_card(post))
+        path = os.path.join(self.directory, 'comments.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as target:
+            writer = csv.writer(target)
+            writer.writerow(['post', 'author', 'text'])
+            writer.writerow([post.pk, 'reader', 'Первая\nвторая строка'])
+            writer.writerow([post.pk + 100, 'reader', 'К несуществующему'])
+        state, _ = Importer('comments', path).run()
+        self.assertEqual((state['imported'], state['rejected']), (1, 1))
+        comment = Comment.objects.get()
+        self.assertEqual(comment.text, 'Первая\nвторая строка')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertIn('Комментариев: 1', render_card(post))
+
+    def test_resume_from_checkpoint(self):
+        """Тест: прерванный импорт продолжается без дублей"""
+        path = self.write_jsonl(
+            {'text': f'Пост {number}', 'author': 'author'}
+            for number in range(5)
+        )
+        flush = Importer.flush
+        calls = []
+
+        def failing_flush(importer, batch, *args):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return flush(importer, batch, *args)
+
+        with mock.patch.object(Importer, 'flush', failing_flush):
+            with self.assertRaises(KeyboardInterrupt):
+                Importer('posts', path, batch_size=2).run()
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTrue(ImportCheckpoint.objects.filter(name=path).exists())
+        state, _ = Importer('posts', path, batch_size=2).run(resume=True)
+        self.assertEqual(state['imported'], 5)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост {number}' for number in range(5)]
+        )
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.author).posts_count, 5
+        )
+
+    def test_checkpoint_commits_with_batch(self):
+        """Тест: без контрольной точки пачка откатывается"""
+        path = self.write_jsonl(
+            {'text': f'Пост {number}', 'author': 'author'}
+            for number in range(4)
+        )
+        save = Importer.save_checkpoint
+        calls = []
+
+        def failing_save(importer, state):
+            calls.append(state['offset'])
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return save(importer, state)
+
+        with mock.patch.object(Importer, 'save_checkpoint', failing_save):
+            with self.assertRaises(KeyboardInterrupt):
+                Importer('posts', path, batch_size=2).run()
+        self.assertEqual(Post.objects.count(), 2)
+        state, _ = Importer('posts', path, batch_size=2).run(resume=True)
+        self.assertEqual(state['imported'], 4)
+        self.assertEqual(Post.objects.count(), 4)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='В группе', author=cls.author, group=cls.group
+        )
+        Post.objects.create(text='Без группы', author=cls.author)
+        Post.objects.create(text='Чужой', author=cls.other)
+
+    def setUp(self):
+        self.client.force_login(self.other)
+
+    def export(self, file_format='jsonl', **params):
+        response = self.client.get(
+            reverse('posts:export_posts', args=(file_format,)), params
+        )
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_jsonl_filters(self):
+        """Тест: выгрузка JSONL учитывает автора и группу"""
+        records = [
+            json.loads(line) for line in self.export(
+                author='author'
+            ).splitlines()
+        ]
+        self.assertEqual(
+            [record['text'] for record in records], ['В группе', 'Без группы']
+        )
+        records = self.export(group='test-slug').splitlines()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(json.loads(records[0])['id'], self.post.pk)
+
+    def test_export_csv_dates(self):
+        """Тест: выгрузка CSV с фильтром по датам"""
+        rows = list(csv.DictReader(io.StringIO(
+            self.export('csv', since=self.post.pub_date.date().isoformat())
+        )))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['group'], 'test-slug')
+        self.assertEqual(self.export('csv', until='2000-01-01').count('\n'), 1)
+
+    def test_export_errors(self):
+        """Тест: неизвестный формат и плохая дата"""
+        url = reverse('posts:export_posts', args=('xml',))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        url = reverse('posts:export_posts', args=('jsonl',))
+        response = self.client.get(url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command_round_trip(self):
+        """Тест: выгрузка команды читается импортом"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'posts.jsonl')
+        call_command(
+            'export_posts', author='other', output=path, stderr=io.StringIO()
+        )
+        state, _ = Importer('posts', path).run()
+        self.assertEqual(state['imported'], 1)
+        self.assertEqual(Post.objects.filter(text='Чужой').count(), 2)
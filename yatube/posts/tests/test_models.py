@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post, User
+from ..models import AuthorCounter, Comment, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -30,3 +35,94 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.commentator = User.objects.create_user(username='commentator')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.group_new = Group.objects.create(
+            title='Тестовая группа два',
+            slug='test-slugtwo',
+            description='Тестовое описание два',
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+
+    def assertCounters(self, author_posts, group_posts, new_group_posts):
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.user).posts_count,
+            author_posts
+        )
+        self.group.refresh_from_db()
+        self.group_new.refresh_from_db()
+        self.assertEqual(self.group.posts_count, group_posts)
+        self.assertEqual(self.group_new.posts_count, new_group_posts)
+
+    def test_post_counters_follow_create_edit_delete(self):
+        """Проверяем счётчики постов при создании, смене группы и удалении"""
+        self.assertCounters(1, 1, 0)
+        self.post.group = self.group_new
+        self.post.save()
+        self.assertCounters(1, 0, 1)
+        Post.objects.create(author=self.user, text='Второй пост')
+        self.assertCounters(2, 0, 1)
+        self.post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_comment_counter_and_cascades(self):
+        """Проверяем счётчик комментариев и каскадные удаления"""
+        for _ in range(2):
+            Comment.objects.create(
+                post=self.post, author=self.commentator, text='Коммент'
+            )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        self.commentator.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.group.delete()
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.group)
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.user).posts_count, 1
+        )
+
+    def test_post_delete_skips_cascaded_comments(self):
+        """Проверяем, что число запросов при удалении поста не растёт
+        с числом комментариев"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.commentator, text='Коммент')
+            for _ in range(500)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+        self.assertLess(len(queries), 20)
+        self.assertFalse(Comment.objects.exists())
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        comment = Comment.objects.create(
+            post=post, author=self.commentator, text='Коммент'
+        )
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """Проверяем, что команда пересчитывает рассинхронизированные
+        счётчики"""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Без сигналов', group=self.group)
+        ])
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.commentator, text='Коммент')
+        ])
+        call_command('rebuild_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertCounters(2, 2, 0)
@@ -0,0 +1,87 @@
+import re
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import live
+from posts.models import Comment, Follow, Group, Post, User
+
+# Полный проход по таблице без индекса или сортировка во временном B-дереве.
+# Проход по уже отобранному подзапросу (COUNT поверх выборки) допустим.
+BAD_PLAN = re.compile(
+    r'^SCAN (TABLE )?(?!subquery$)\w+( AS \w+)?$'
+    r'|USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY'
+)
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.auth = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.auth, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.auth, text='Текст')
+
+    def setUp(self):
+        self.auth_client = Client()
+        self.auth_client.force_login(self.auth)
+
+    def explain(self, sql):
+        # captured_queries хранит SQL с уже подставленными значениями.
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoBadPlans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.auth_client.get(url)
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            plan = self.explain(sql)
+            bad = [line for line in plan if BAD_PLAN.search(line)]
+            self.assertFalse(
+                bad, f'{url}: плохой план {bad}\n{sql}\n' + '\n'.join(plan)
+            )
+
+    def test_views_use_indexes(self):
+        """Тест: запросы страниц не сканируют таблицы и не сортируют
+        во временном B-дереве"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            for query in ('', '?cursor='):
+                with self.subTest(url=url + query):
+                    self.assertNoBadPlans(url + query)
+            with self.subTest(url=url, cursor='next'):
+                page = self.auth_client.get(url + '?cursor=').context.get(
+                    'page_obj'
+                )
+                if page is not None:
+                    token = page.paginator._cursor_for('n', page[0])
+                    self.assertNoBadPlans(f'{url}?cursor={token}')
+
+    def test_new_posts_use_indexes(self):
+        """Тест: опрос новых постов идёт по индексам дат"""
+        since = live.since_token(self.post)
+        url = reverse('posts:new_posts')
+        for feed in ('index', 'follow'):
+            with self.subTest(feed=feed):
+                self.assertNoBadPlans(f'{url}?since={since}&feed={feed}')
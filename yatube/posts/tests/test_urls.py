@@ -1,8 +1,11 @@
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from posts import views
+from posts.middleware import QueryBudgetExceeded
 from posts.models import Group, Post, User
 
 
@@ -114,3 +117,32 @@ class PostURLTests(TestCase):
                     )
                 else:
                     self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        self.auth_client = Client()
+        self.auth_client.force_login(self.auth)
+
+    def test_budget_violation_fails_with_sql(self):
+        """Тест: превышение бюджета запросов в тестах роняет запрос"""
+        with mock.patch.object(views.index, 'query_budget', 1):
+            with self.assertRaisesMessage(
+                QueryBudgetExceeded, 'FROM "posts_post"'
+            ):
+                self.auth_client.get(reverse('posts:index'))
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_budget_violation_logged_in_production(self):
+        """Тест: в боевом режиме превышение пишется в лог"""
+        with mock.patch.object(views.index, 'query_budget', 1):
+            with self.assertLogs('posts.query_budget', 'WARNING') as logs:
+                response = self.auth_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(logs.records[0].view, 'posts:index')
+        self.assertGreater(logs.records[0].queries, 1)
@@ -1,15 +1,24 @@
 import shutil
 import tempfile
+import time
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from posts import counters, follow_graph, live
+from posts.cards import card_key, render_card
 from posts.forms import PostForm
-from posts.models import Group, Post, User
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CURSOR_NEXT, encode_cursor
+from posts.versions import versions
 
 SHIFT_POST = 3
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -148,7 +157,8 @@ class PostPagesTest(TestCase):
     def test_cache(self):
         """ Проверка кэша (не в карманах) на начальной странице"""
         response = self.auth_client.get(reverse('posts:index'))
-        self.post.delete()
+        # Правка в обход сигналов не сбрасывает версию страницы.
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый текст')
         response_after = self.auth_client.get(reverse('posts:index'))
         self.assertEqual(response.content, response_after.content)
         cache.clear()
@@ -205,3 +215,755 @@ class PaginatorViewsTest(TestCase):
                             len(response.context['page_obj'].object_list)
                         )
                         self.assertEqual(posts_on_pages, page_quantity)
+
+
+@override_settings(LIMITS_IN_PAGE=1, PAGINATION_WINDOW=1)
+class WindowedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        for number in range(10):
+            Post.objects.create(author=cls.auth, text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_window(self):
+        """Тест: в навигации только окно соседних страниц"""
+        response = self.client.get(
+            reverse('posts:profile', args=(self.auth.username,)),
+            {'page': 5}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj.page_window), [4, 5, 6])
+        self.assertEqual(page_obj.last_page_number, 10)
+        for number in (1, 4, 6, 10):
+            self.assertContains(response, f'href="?page={number}"')
+        for number in (3, 7):
+            self.assertNotContains(response, f'href="?page={number}"')
+
+    def test_page_past_estimate(self):
+        """Тест: следующая страница видна, даже если оценка занижена"""
+        counter = self.auth.counter
+        counter.posts_count = 2
+        counter.save()
+        response = self.client.get(
+            reverse('posts:profile', args=(self.auth.username,)),
+            {'page': 5}
+        )
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.has_next())
+        self.assertEqual(page_obj.last_page_number, 6)
+        response = self.client.get(
+            reverse('posts:profile', args=(self.auth.username,)),
+            {'page': 50}
+        )
+        self.assertEqual(response.context['page_obj'].number, 10)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_absurd_page_number(self):
+        """Тест: огромный номер страницы даёт последнюю без COUNT(*)"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('posts:index'), {'page': '9' * 20}
+            )
+        self.assertEqual(response.context['page_obj'].number, 10)
+        self.assertFalse(
+            [query for query in context if 'COUNT(' in query['sql']]
+        )
+
+    def test_index_without_count(self):
+        """Тест: главная не считает посты, пока число есть в кэше"""
+        cache.set(
+            counters.count_key('index'), (10, time.time()),
+            settings.PAGE_COUNT_TIMEOUT
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].last_page_number, 10)
+        self.assertFalse(
+            [query for query in context if 'COUNT(' in query['sql']]
+        )
+
+    @override_settings(PAGE_COUNT_WORKERS=0)
+    def test_count_refreshed(self):
+        """Тест: без кэша отдаём оценку, устаревшее число пересчитываем"""
+        posts = Post.objects.all()
+        key = counters.count_key('index')
+        with mock.patch(
+            'posts.counters.transaction.on_commit', lambda submit: submit()
+        ):
+            self.assertEqual(
+                counters.cached_count('index', '', posts, lambda: 100), 100
+            )
+            self.assertEqual(cache.get(key)[0], 10)
+            cache.set(key, (7, time.time() - settings.PAGE_COUNT_REFRESH - 1))
+            self.assertEqual(counters.cached_count('index', '', posts), 7)
+            self.assertEqual(counters.cached_count('index', '', posts), 10)
+
+
+@override_settings(CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.auth, text=f'Пост {i}', group=cls.group)
+            for i in range(settings.LIMITS_IN_PAGE + SHIFT_POST)
+        ])
+
+    def setUp(self) -> None:
+        self.auth_client = Client()
+        self.auth_client.force_login(self.auth)
+        cache.clear()
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Тест: курсорные страницы идут вперёд и назад без пропусков"""
+        names_args: tuple = (
+            ('posts:index', None, ),
+            ('posts:group_posts', (self.group.slug,), ),
+            ('posts:profile', (self.auth,), ),
+        )
+        for name, args in names_args:
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                first = self.auth_client.get(url).context['page_obj']
+                self.assertEqual(len(first), settings.LIMITS_IN_PAGE)
+                self.assertFalse(first.has_previous())
+                second = self.auth_client.get(
+                    f'{url}?cursor={first.next_cursor}'
+                ).context['page_obj']
+                self.assertEqual(len(second), SHIFT_POST)
+                self.assertFalse(second.has_next())
+                seen = [post.pk for post in first] + [
+                    post.pk for post in second
+                ]
+                self.assertEqual(len(set(seen)), len(seen))
+                back = self.auth_client.get(
+                    f'{url}?cursor={second.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in back], [post.pk for post in first]
+                )
+
+    def test_broken_cursor_gives_first_page(self):
+        """Тест: битый курсор отдаёт первую страницу"""
+        response = self.auth_client.get(
+            reverse('posts:index') + '?cursor=broken'
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), settings.LIMITS_IN_PAGE
+        )
+
+    def test_numeric_cursor_gives_first_page(self):
+        """Тест: числовой курсор для списка по дате — как битый"""
+        cursor = encode_cursor(CURSOR_NEXT, 1.5, 3)
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'), author=self.auth
+        )
+        self.auth_client.force_login(User.objects.get(username='reader'))
+        names_args: tuple = (
+            ('posts:index', None, ),
+            ('posts:group_posts', (self.group.slug,), ),
+            ('posts:profile', (self.auth,), ),
+            ('posts:follow_index', None, ),
+        )
+        for name, args in names_args:
+            with self.subTest(name=name):
+                page = self.auth_client.get(
+                    reverse(name, args=args), {'cursor': cursor}
+                ).context['page_obj']
+                self.assertEqual(len(page), settings.LIMITS_IN_PAGE)
+                self.assertIsNone(page.cursor)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.auth, text='Ищем <b>слона</b> в посудной лавке'
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.auth, text=f'Пост про жирафа номер {i}')
+            for i in range(settings.LIMITS_IN_PAGE + SHIFT_POST)
+        ])
+
+    def search(self, query, cursor=None):
+        data = {'q': query}
+        if cursor:
+            data['cursor'] = cursor
+        return self.client.get(
+            reverse('posts:search'), data
+        ).context['page_obj']
+
+    def test_search_highlights_and_escapes(self):
+        """Тест: поиск находит пост и безопасно подсвечивает совпадение"""
+        page = self.search('СЛОНА')
+        self.assertEqual([post.pk for post in page], [self.post.pk])
+        self.assertIn('<mark>слона</mark>', page[0].snippet)
+        self.assertNotIn('<b>', page[0].snippet)
+
+    def test_search_index_follows_edit_and_delete(self):
+        """Тест: индекс обновляется при изменении и удалении поста"""
+        self.post.text = 'Теперь тут бегемот'
+        self.post.save()
+        self.assertEqual(len(self.search('слона')), 0)
+        self.assertEqual(len(self.search('бегемот')), 1)
+        self.post.delete()
+        self.assertEqual(len(self.search('бегемот')), 0)
+
+    def test_search_cursor_pages(self):
+        """Тест: результаты поиска листаются курсором без повторов"""
+        first = self.search('жирафа')
+        self.assertEqual(len(first), settings.LIMITS_IN_PAGE)
+        second = self.search('жирафа', first.next_cursor)
+        self.assertEqual(len(second), SHIFT_POST)
+        ids = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(len(set(ids)), len(ids))
+        back = self.search('жирафа', second.previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in first]
+        )
+
+    def test_date_cursor_gives_first_page(self):
+        """Тест: курсор с датой для поиска по релевантности — как битый"""
+        page = self.search(
+            'жирафа', encode_cursor(CURSOR_NEXT, timezone.now(), 3)
+        )
+        self.assertEqual(len(page), settings.LIMITS_IN_PAGE)
+        self.assertFalse(page.has_previous())
+
+    def test_empty_query(self):
+        """Тест: пустой запрос или одни знаки не ломают поиск"""
+        for query in ('', '"*(', 'AND'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.auth, text='Тестовый пост', group=self.group
+        )
+
+    def card(self):
+        post = Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk
+        )
+        return render_card(post)
+
+    def test_card_is_cached_until_version_changes(self):
+        """Тест: карточка берётся из кэша и сбрасывается при изменениях"""
+        first = self.card()
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertEqual(self.card(), first)
+        changes = (
+            lambda: self.post.save(),
+            lambda: Group.objects.filter(pk=self.group.pk).first().save(),
+            lambda: User.objects.get(pk=self.auth.pk).save(),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.auth, text='Коммент'
+            ),
+        )
+        for change in changes:
+            with self.subTest(change=change):
+                cache.set(card_key(self.post, False, False), 'старое')
+                self.assertEqual(self.card(), 'старое')
+                change()
+                self.assertNotEqual(self.card(), 'старое')
+
+    def test_rebuild_counters_resets_cards_and_pages(self):
+        """Тест: пересчёт счётчиков сбрасывает карточки и страницы"""
+        self.assertIn('Комментариев: 0', self.card())
+        index = Client().get(reverse('posts:index')).content.decode()
+        self.assertIn('Комментариев: 0', index)
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.auth, text='Коммент')
+        ])
+        counters.rebuild()
+        self.assertIn('Комментариев: 1', self.card())
+        index = Client().get(reverse('posts:index')).content.decode()
+        self.assertIn('Комментариев: 1', index)
+
+    def test_comments_in_transaction_invalidate_once(self):
+        """Тест: комментарии в одной транзакции ищут страницы поста
+        один раз и ещё раз после коммита"""
+        start = len(connection.run_on_commit)
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                for _ in range(5):
+                    Comment.objects.create(
+                        post=self.post, author=self.auth, text='Коммент'
+                    )
+        lookups = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "auth_user"."username"')
+        ]
+        self.assertEqual(len(lookups), 1)
+        before = versions(('post', self.post.pk), ('group', self.group.slug))
+        with CaptureQueriesContext(connection) as queries:
+            for _, func in connection.run_on_commit[start:]:
+                func()
+        self.assertEqual(len(queries), 1)
+        after = versions(('post', self.post.pk), ('group', self.group.slug))
+        self.assertTrue(all(new > old for new, old in zip(after, before)))
+
+    def test_last_login_does_not_invalidate(self):
+        """Тест: вход пользователя не сбрасывает его карточки"""
+        self.card()
+        key = card_key(self.post, False, False)
+        self.auth_client = Client()
+        self.auth_client.force_login(self.auth)
+        self.assertEqual(card_key(self.post, False, False), key)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.auth_client = Client()
+        self.auth_client.force_login(self.auth)
+        self.post = Post.objects.create(
+            author=self.auth, text='Первый пост', group=self.group
+        )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.auth,)),
+        )
+
+    def test_anonymous_pages_are_cached(self):
+        """Тест: анонимные страницы отдаются из кэша, авторизованные — нет"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertIsNotNone(self.client.get(url).context)
+                self.assertIsNone(self.client.get(url).context)
+                self.assertIsNotNone(self.auth_client.get(url).context)
+                self.assertIsNotNone(
+                    self.client.get(url + '?page=1').context
+                )
+
+    def test_post_create_and_edit_invalidate_pages(self):
+        """Тест: создание и правка поста сбрасывают кэш страниц"""
+        for url in self.urls:
+            self.assertNotContains(self.client.get(url), 'Новая запись')
+        self.auth_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новая запись', 'group': self.group.pk}
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Новая запись')
+        self.auth_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'Исправленная запись', 'group': self.group.pk}
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.client.get(url), 'Исправленная запись'
+                )
+
+    def test_comment_invalidates_pages(self):
+        """Тест: новый комментарий сбрасывает кэш страниц"""
+        for url in self.urls:
+            self.assertContains(self.client.get(url), 'Комментариев: 0')
+        self.auth_client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            data={'text': 'Комментарий'}
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Комментариев: 1')
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.auth, text='Тестовый пост')
+        Comment.objects.create(post=cls.post, author=cls.auth, text='Первый')
+
+    def detail_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        return len(context), response
+
+    def test_comments_without_n_plus_one(self):
+        """Тест: число запросов не зависит от числа комментариев"""
+        queries_before, _ = self.detail_queries()
+        Comment.objects.bulk_create([
+            Comment(
+                post=self.post,
+                author=User.objects.create_user(username=f'user{i}'),
+                text=f'Комментарий {i}',
+            )
+            for i in range(settings.COMMENTS_IN_PAGE + SHIFT_POST)
+        ])
+        queries_after, response = self.detail_queries()
+        self.assertEqual(queries_after, queries_before)
+        self.assertEqual(
+            len(response.context['comments']), settings.COMMENTS_IN_PAGE
+        )
+
+    def test_load_more_fragment(self):
+        """Тест: фрагмент «Показать ещё» отдаёт следующие комментарии"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.auth, text=f'Коммент {i}')
+            for i in range(settings.COMMENTS_IN_PAGE + SHIFT_POST)
+        ])
+        first = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': first.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        second = response.context['comments']
+        self.assertEqual(len(second), SHIFT_POST + 1)
+        self.assertFalse(second.has_next())
+        self.assertFalse(
+            {c.pk for c in first} & {c.pk for c in second}
+        )
+
+    def test_numeric_cursor_gives_first_page(self):
+        """Тест: числовой курсор комментариев — как битый"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            {'comments': encode_cursor(CURSOR_NEXT, 1.5, 3)}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': encode_cursor(CURSOR_NEXT, 1.5, 3)}
+        )
+        self.assertEqual(len(response.context['comments']), 1)
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Пост для ленты', author=cls.auth, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """Тест: RSS и Atom для главной, группы и автора"""
+        urls = {
+            reverse('posts:index_rss'): 'application/rss+xml',
+            reverse('posts:index_atom'): 'application/atom+xml',
+            reverse('posts:group_rss', args=('test-slug',)):
+                'application/rss+xml',
+            reverse('posts:group_atom', args=('test-slug',)):
+                'application/atom+xml',
+            reverse('posts:profile_rss', args=('auth',)):
+                'application/rss+xml',
+            reverse('posts:profile_atom', args=('auth',)):
+                'application/atom+xml',
+        }
+        for url, content_type in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type
+                ))
+                self.assertContains(response, 'Пост для ленты')
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+
+    def test_not_modified(self):
+        """Тест: 304 отдаётся без построения ленты"""
+        url = reverse('posts:group_rss', args=('test-slug',))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_unknown_group(self):
+        """Тест: лента несуществующей группы — 404"""
+        response = self.client.get(
+            reverse('posts:group_rss', args=('nothing',))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.auth, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_not_modified(self):
+        """Тест: повторный запрос страницы без изменений — 304"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=('test-slug',)),
+            reverse('posts:profile', args=('auth',)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # Первый ответ ставит CSRF-cookie, а она входит в ETag.
+                self.reader_client.get(url)
+                response = self.reader_client.get(url)
+                self.assertIn('Last-Modified', response)
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_reset_etag(self):
+        """Тест: пост, комментарий и подписка меняют ETag"""
+        detail = reverse('posts:post_detail', args=(self.post.pk,))
+        profile = reverse('posts:profile', args=('auth',))
+        changes = {
+            reverse('posts:index'): lambda: Post.objects.create(
+                text='Новый пост', author=self.auth
+            ),
+            detail: lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Коммент'
+            ),
+            profile: lambda: self.reader_client.get(
+                reverse('posts:profile_follow', args=('auth',))
+            ),
+        }
+        for url, change in changes.items():
+            with self.subTest(url=url):
+                etag = self.reader_client.get(url)['ETag']
+                change()
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_follower_profile(self):
+        """Тест: подписка и отписка меняют профиль самого подписчика"""
+        profile = reverse('posts:profile', args=('reader',))
+        actions = (
+            ('posts:profile_follow', 'подписок: 1'),
+            ('posts:profile_unfollow', 'подписок: 0'),
+        )
+        for action, text in actions:
+            with self.subTest(action=action):
+                Client().get(profile)
+                etag = self.reader_client.get(profile)['ETag']
+                self.reader_client.get(reverse(action, args=('auth',)))
+                self.assertContains(Client().get(profile), text)
+                response = self.reader_client.get(
+                    profile, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Тест: ETag у разных пользователей разный"""
+        url = reverse('posts:index')
+        etag = self.reader_client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_post(self):
+        """Тест: для несуществующего поста остаётся 404"""
+        response = self.reader_client.get(
+            reverse('posts:post_detail', args=(self.post.pk + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(LIMITS_IN_PAGE=3)
+class NewPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.auth)
+        cls.post = Post.objects.create(text='Старый пост', author=cls.auth)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def since(self, client, url):
+        response = client.get(url)
+        self.assertContains(response, 'id="new-posts"')
+        return response.context['page_obj'][0]
+
+    def test_index_new_posts(self):
+        """Тест: опрос главной отдаёт только новые посты карточками"""
+        since = live.since_token(self.since(self.client, reverse(
+            'posts:index'
+        )))
+        url = reverse('posts:new_posts')
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {'since': since}).json()
+        self.assertEqual((data['count'], data['since']), (0, since))
+        Post.objects.create(text='Свежий пост', author=self.reader)
+        data = self.client.get(url, {'since': since}).json()
+        self.assertEqual(data['count'], 1)
+        self.assertIn('Свежий пост', data['html'])
+        self.assertNotIn('Старый пост', data['html'])
+        data = self.client.get(
+            url, {'since': data['since'], 'format': 'json'}
+        ).json()
+        self.assertEqual(data['posts'], [])
+
+    def test_follow_new_posts(self):
+        """Тест: опрос ленты подписок видит только авторов из подписок"""
+        since = live.since_token(self.since(self.reader_client, reverse(
+            'posts:follow_index'
+        )))
+        url = reverse('posts:new_posts')
+        params = {'since': since, 'feed': 'follow', 'format': 'json'}
+        self.assertEqual(self.client.get(url, params).status_code, 401)
+        Post.objects.create(text='Чужой пост', author=self.reader)
+        Post.objects.create(text='Пост автора', author=self.auth)
+        data = self.reader_client.get(url, params).json()
+        self.assertEqual(
+            [post['text'] for post in data['posts']], ['Пост автора']
+        )
+
+    def test_too_many_new_posts(self):
+        """Тест: при большом числе новых постов предлагаем обновить"""
+        since = live.since_token(self.post)
+        for number in range(4):
+            Post.objects.create(text=f'Пост {number}', author=self.auth)
+        data = self.client.get(
+            reverse('posts:new_posts'), {'since': since}
+        ).json()
+        self.assertTrue(data['more'])
+        self.assertEqual(data['count'], 0)
+
+    def test_bad_cursor(self):
+        """Тест: без курсора или с битым курсором — 400"""
+        url = reverse('posts:new_posts')
+        self.assertEqual(self.client.get(url).status_code, 400)
+        response = self.client.get(url, {'since': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_graph_cached(self):
+        """Тест: граф подписок читается из кэша после первого запроса"""
+        Follow.objects.create(user=self.reader, author=self.auth)
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.auth.pk)
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(follow_graph.get(self.auth.pk), {
+                'following': frozenset(), 'followers': 1,
+            })
+            self.assertEqual(
+                follow_graph.get(self.reader.pk)['following'],
+                frozenset({self.auth.pk}),
+            )
+
+    def test_follow_invalidates_graph(self):
+        """Тест: подписка и отписка сбрасывают граф обоих пользователей"""
+        profile = reverse('posts:profile', args=(self.auth.username,))
+        response = self.reader_client.get(profile)
+        self.assertFalse(response.context['following'])
+        self.assertEqual(response.context['followers_count'], 0)
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.auth.username,))
+        )
+        response = self.reader_client.get(profile)
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, 'Подписчиков: 1, подписок: 0')
+        self.assertEqual(
+            follow_graph.get(self.reader.pk)['following'],
+            frozenset({self.auth.pk}),
+        )
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.auth.username,))
+        )
+        response = self.reader_client.get(profile)
+        self.assertFalse(response.context['following'])
+        self.assertEqual(response.context['followers_count'], 0)
+
+    def test_user_deletion_invalidates_graph(self):
+        """Тест: удаление подписчика сбрасывает граф автора"""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.auth)
+        self.assertEqual(follow_graph.get(self.auth.pk)['followers'], 1)
+        follower.delete()
+        self.assertEqual(follow_graph.get(self.auth.pk)['followers'], 0)
@@ -0,0 +1,108 @@
+import threading
+
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase
+
+from posts import writer
+from posts.middleware import QueryCounter, counting
+from posts.models import Comment, Post, User
+
+
+class WriteCoordinatorTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.coordinator = writer.WriteCoordinator(window=0.3, batch_size=10)
+
+    def comment(self, text):
+        return Comment.objects.create(
+            post=self.post, author=self.author, text=text
+        )
+
+    def in_threads(self, funcs):
+        results = [None] * len(funcs)
+
+        def call(index, func):
+            try:
+                results[index] = self.coordinator.submit(func)
+            except Exception as error:
+                results[index] = error
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=call, args=(index, func))
+            for index, func in enumerate(funcs)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_group_commit(self):
+        """Тест: записи из разных потоков коммитятся одной пачкой"""
+        results = self.in_threads([
+            lambda number=number: self.comment(f'Комментарий {number}')
+            for number in range(5)
+        ])
+        self.assertEqual(self.coordinator.batches, 1)
+        self.assertEqual(self.coordinator.writes, 5)
+        self.assertEqual(
+            sorted(comment.pk for comment in results),
+            sorted(Comment.objects.values_list('pk', flat=True)),
+        )
+
+    def test_failure_is_isolated(self):
+        """Тест: ошибка одной записи не откатывает остальные в пачке"""
+        def broken():
+            self.comment('Откатится')
+            raise ValueError('Ошибка записи')
+
+        results = self.in_threads([
+            lambda: self.comment('Первый'), broken,
+            lambda: self.comment('Второй'),
+        ])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            ['Второй', 'Первый'],
+        )
+
+    def test_read_your_writes(self):
+        """Тест: после ответа писателя запись видна вызывающему"""
+        comment = writer.write(self.comment, 'Свой комментарий')
+        self.assertTrue(Comment.objects.filter(pk=comment.pk).exists())
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 1
+        )
+
+    def test_queries_counted_for_caller(self):
+        """Тест: запросы писателя попадают в счётчики вызывающего"""
+        outer, inner = QueryCounter(), QueryCounter()
+        with counting(outer), counting(inner):
+            writer.write(self.comment, 'Посчитанный')
+        self.assertTrue(any(
+            'INSERT INTO "posts_comment"' in sql for sql in inner.queries
+        ))
+        self.assertEqual(outer.queries, inner.queries)
+
+    def test_defer(self):
+        """Тест: отложенная запись не ждёт писателя, ошибка пишется в лог"""
+        def broken():
+            raise ValueError('Ошибка записи')
+
+        with self.assertLogs('posts.writer', 'ERROR'):
+            writer.defer(self.comment, 'Фоновый')
+            writer.defer(broken)
+            # Писатель один и берёт задачи по порядку.
+            writer.coordinator().submit(lambda: None)
+        self.assertTrue(Comment.objects.filter(text='Фоновый').exists())
+
+
+class InlineWriteTest(TestCase):
+    def test_inside_transaction(self):
+        """Тест: внутри открытой транзакции запись идёт в ней же"""
+        with transaction.atomic():
+            thread = writer.write(threading.get_ident)
+        self.assertEqual(thread, threading.get_ident())
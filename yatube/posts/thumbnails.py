@@ -0,0 +1,46 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+
+_executor = None
+
+
+def init_worker():
+    # Процессы запускаются через spawn: соединения с БД не наследуются,
+    # а Django настраивается заново по DJANGO_SETTINGS_MODULE.
+    django.setup()
+
+
+def generate(name):
+    """
+    Строит все миниатюры из THUMBNAIL_PRESETS для картинки name.
+    Выполняется в дочернем процессе, поэтому возвращает ошибку строкой.
+    """
+    from sorl.thumbnail import get_thumbnail
+
+    try:
+        for geometry, options in settings.THUMBNAIL_PRESETS:
+            get_thumbnail(name, geometry, **options)
+    except Exception as error:
+        return name, repr(error)
+    return name, None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+    return _executor
+
+
+def schedule(name):
+    """Ставит генерацию миниатюр в фоновый пул, не дожидаясь результата."""
+    if not settings.THUMBNAIL_WORKERS:
+        return generate(name)
+    executor().submit(generate, name)
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db import connection
+from django.db.transaction import on_commit
+from django.db.models import F, Q
+
+from . import follow_graph, writer
+from .models import Follow, Post, Timeline
+
+BATCH_SIZE = 500
+FEED_FIELDS = ('feed_date', 'feed_post')
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True
+        )[:settings.TIMELINE_FANOUT_LIMIT + 1]
+    )
+    if len(followers) > settings.TIMELINE_FANOUT_LIMIT:
+        return
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_after(last_pk, heavy_ids=None):
+    """
+    Раскладывает по лентам все посты с pk > last_pk одним запросом
+    INSERT ... SELECT; нужно после массовой вставки без сигналов.
+    """
+    if heavy_ids is None:
+        heavy_ids = follow_graph.heavy_authors()
+    sql = (
+        f'INSERT INTO {Timeline._meta.db_table} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date '
+        f'FROM {Post._meta.db_table} p '
+        f'JOIN {Follow._meta.db_table} f ON f.author_id = p.author_id '
+        f'WHERE p.id > %s'
+    )
+    params = [last_pk]
+    if heavy_ids:
+        placeholders = ', '.join(['%s'] * len(heavy_ids))
+        sql += f' AND p.author_id NOT IN ({placeholders})'
+        params += heavy_ids
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту подписчика постами автора."""
+    if follow_graph.is_heavy(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    batch = []
+    for post_id, pub_date in posts.iterator():
+        batch.append(
+            Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        )
+        if len(batch) == BATCH_SIZE:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def refill(author_id):
+    """
+    Дозаполняет ленты всех подписчиков автора его постами одним
+    INSERT ... SELECT. Если к этому времени автор снова стал тяжёлым,
+    ничего не делает.
+    """
+    if Follow.objects.filter(
+        author_id=author_id
+    ).count() > settings.TIMELINE_FANOUT_LIMIT:
+        return 0
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{Timeline._meta.db_table} (user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date '
+        f'FROM {Post._meta.db_table} p '
+        f'JOIN {Follow._meta.db_table} f ON f.author_id = p.author_id '
+        f'WHERE p.author_id = %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [author_id])
+        return cursor.rowcount
+
+
+def cleanup(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося подписчика."""
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+    followers = follow_graph.get(author_id)['followers']
+    if followers == settings.TIMELINE_FANOUT_LIMIT:
+        # Автор только что перестал быть «тяжёлым»: его посты больше
+        # не подмешиваются при чтении. Ленты всех подписчиков
+        # дозаполняет писатель, а не запрос отписки.
+        on_commit(lambda: writer.defer(refill, author_id))
+
+
+def feed(user):
+    """
+    Лента подписок: материализованная часть плюс тяжёлые авторы.
+    Сортируется по FEED_FIELDS: без тяжёлых авторов это поля самой
+    ленты, и выборка идёт по индексу timeline_user_date_idx. Подписки
+    и тяжёлые авторы берутся из кэша follow_graph; без подписок к базе
+    не обращаемся вовсе.
+    """
+    heavy = follow_graph.heavy_following(user.pk)
+    if not follow_graph.get(user.pk)['following']:
+        posts = Post.objects.none().annotate(
+            feed_date=F('pub_date'), feed_post=F('pk')
+        )
+    elif not heavy:
+        posts = Post.objects.filter(timeline__user=user).annotate(
+            feed_date=F('timeline__pub_date'),
+            feed_post=F('timeline__post'),
+        )
+    else:
+        posts = Post.objects.filter(
+            Q(pk__in=Timeline.objects.filter(user=user).values('post'))
+            | Q(author__in=heavy)
+        ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
+    return posts.order_by(*(f'-{field}' for field in FEED_FIELDS))
@@ -1,14 +1,51 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path(
+        'rss/',
+        feeds.conditional('index')(feeds.IndexFeed()),
+        name='index_rss'
+    ),
+    path(
+        'atom/',
+        feeds.conditional('index')(feeds.AtomIndexFeed()),
+        name='index_atom'
+    ),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path(
+        'group/<slug:slug>/rss/',
+        feeds.conditional('group', 'slug')(feeds.GroupFeed()),
+        name='group_rss'
+    ),
+    path(
+        'group/<slug:slug>/atom/',
+        feeds.conditional('group', 'slug')(feeds.AtomGroupFeed()),
+        name='group_atom'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.conditional('profile', 'username')(feeds.ProfileFeed()),
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.conditional('profile', 'username')(feeds.AtomProfileFeed()),
+        name='profile_atom'
+    ),
+    path('search/', views.search, name='search'),
+    path('posts/new/', views.new_posts, name='new_posts'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -16,6 +53,21 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'export/posts.<str:file_format>',
+        views.export_posts,
+        name='export_posts'
+    ),
+    path('api/posts/', api.post_list, name='api_posts'),
+    path('api/posts/<int:post_id>/', api.post_item, name='api_post'),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.comment_list,
+        name='api_comments'
+    ),
+    path('api/groups/', api.group_list, name='api_groups'),
+    path('api/groups/<slug:slug>/', api.group_item, name='api_group'),
+    path('api/follow/', api.follow_feed, name='api_follow'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
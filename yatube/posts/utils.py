@@ -1,9 +1,277 @@
+import base64
+import datetime
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import (
+    EmptyPage, Page, PageNotAnInteger, Paginator
+)
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+MAX_OFFSET = 2 ** 63 - 1
+
+
+def encode_cursor(direction, value, pk):
+    """Упаковывает позицию (дата или число, pk) в токен для URL."""
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    else:
+        value = repr(float(value))
+    raw = f'{direction}|{value}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, value, pk = raw.split('|')
+        value = parse_datetime(value) or float(value)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+        return None
+    return direction, value, pk
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: знает только соседние токены."""
+
+    def __init__(self, object_list, paginator, cursor,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, 1, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Page cursor={self.cursor!r}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация по паре полей (дата, уникальный id) без COUNT(*)
+    и OFFSET. Каждая страница — один запрос с условием по предыдущей
+    позиции. Если первое поле само уникально, пара — (поле, поле).
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, fields=('pub_date', 'pk')):
+        super().__init__(object_list, per_page)
+        self.field, self.tie_field = fields
+
+    @cached_property
+    def value_type(self):
+        """Тип значения позиции в курсоре: дата для полей-дат, иначе число."""
+        query, opts = self.object_list.query, self.object_list.model._meta
+        if self.field in query.annotations:
+            field = query.annotations[self.field].output_field
+        elif self.field == 'pk':
+            field = opts.pk
+        else:
+            field = opts.get_field(self.field)
+        if isinstance(field, models.DateTimeField):
+            return datetime.datetime
+        return float
+
+    def _boundary(self, direction, value, pk):
+        lookup = 'lt' if direction == CURSOR_NEXT else 'gt'
+        if self.field == self.tie_field:
+            return Q(**{f'{self.field}__{lookup}': value})
+        return (
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'{self.tie_field}__{lookup}': pk})
+        )
+
+    def _ordering(self, prefix):
+        fields = dict.fromkeys((self.field, self.tie_field))
+        return [f'{prefix}{field}' for field in fields]
+
+    def _cursor_for(self, direction, obj):
+        return encode_cursor(
+            direction,
+            getattr(obj, self.field),
+            getattr(obj, self.tie_field)
+        )
+
+    def _fetch(self, position, limit):
+        """
+        Отдаёт до limit объектов за позицией position в порядке обхода:
+        для CURSOR_PREVIOUS — в обратном порядке.
+        """
+        if position is None:
+            queryset = self.object_list.order_by(*self._ordering('-'))
+        else:
+            queryset = self.object_list.filter(self._boundary(*position))
+            if position[0] == CURSOR_NEXT:
+                queryset = queryset.order_by(*self._ordering('-'))
+            else:
+                queryset = queryset.order_by(*self._ordering(''))
+        return list(queryset[:limit])
+
+    def get_cursor_page(self, token):
+        position = decode_cursor(token)
+        # Курсор другой пагинации сравнивал бы дату с числом.
+        if position is not None and not isinstance(
+            position[1], self.value_type
+        ):
+            position = None
+        if position is None:
+            token = None
+            direction = CURSOR_NEXT
+        else:
+            direction = position[0]
+        objects = self._fetch(position, self.per_page + 1)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if direction == CURSOR_PREVIOUS:
+            objects.reverse()
+        has_next = has_more if direction == CURSOR_NEXT else True
+        has_previous = (
+            token is not None if direction == CURSOR_NEXT else has_more
+        )
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = self._cursor_for(CURSOR_NEXT, objects[-1])
+        if objects and has_previous:
+            previous_cursor = self._cursor_for(CURSOR_PREVIOUS, objects[0])
+        return CursorPage(
+            objects, self, token, next_cursor, previous_cursor
+        )
+
+
+class WindowedPage(Page):
+    """
+    Страница с окном соседних номеров. Есть ли следующая страница,
+    узнаём по лишней строке выборки: общее число записей может быть
+    приблизительным.
+    """
+
+    def __init__(self, object_list, number, paginator, more):
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self):
+        return self.more
+
+    @property
+    def last_page_number(self):
+        if not self.more:
+            return self.number
+        return max(self.paginator.num_pages, self.number + 1)
+
+    @property
+    def page_window(self):
+        window = settings.PAGINATION_WINDOW
+        return range(
+            max(1, self.number - window),
+            min(self.last_page_number, self.number + window) + 1
+        )
+
+
+class WindowedPaginator(Paginator):
+    """
+    Нумерованные страницы без COUNT(*) на каждый запрос: total —
+    функция, которая отдаёт закэшированное или оценочное число записей,
+    и вызывается, только если навигацию нужно показать.
+    """
+
+    def __init__(self, object_list, per_page, total):
+        super().__init__(object_list, per_page)
+        self.total = total
+
+    @cached_property
+    def count(self):
+        return self.total()
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise EmptyPage('Страница пуста')
+        return WindowedPage(
+            objects[:self.per_page], number, self,
+            len(objects) > self.per_page
+        )
+
+    def get_page(self, number):
+        try:
+            number = self.validate_number(number)
+        except (PageNotAnInteger, EmptyPage):
+            number = 1
+        # Смещение такой страницы не помещается в целое SQLite, и
+        # запрос упал бы с ошибкой.
+        if number * self.per_page < MAX_OFFSET:
+            try:
+                return self.page(number)
+            except EmptyPage:
+                pass
+        # Номер за концом списка: сначала последняя страница по total.
+        # COUNT(*) нужен, только если total ошибся и она пуста или за
+        # ней есть ещё записи.
+        try:
+            page = self.page(self.num_pages)
+        except EmptyPage:
+            page = None
+        if page is None or page.has_next():
+            self.count = self.object_list.count()
+            self.__dict__.pop('num_pages', None)
+            page = self.page(self.num_pages)
+        return page
+
+
+def comment_page(post, cursor):
+    """Страница комментариев поста вместе с авторами, новые сверху."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_IN_PAGE,
+        ('created', 'pk'),
+    )
+    return paginator.get_cursor_page(cursor)
 
 
-def paginations(request, posts_list):
-    paginator = Paginator(posts_list, settings.LIMITS_IN_PAGE)
+def paginations(request, posts_list, fields=('pub_date', 'pk'),
+                total=None):
+    """
+    Постраничный вывод. Курсорный режим включается настройкой
+    CURSOR_PAGINATION или параметром ?cursor= в запросе. total — функция
+    с числом записей для навигации, по умолчанию COUNT(*).
+    """
+    cursor = request.GET.get('cursor')
+    if settings.CURSOR_PAGINATION or cursor is not None:
+        paginator = CursorPaginator(
+            posts_list, settings.LIMITS_IN_PAGE, fields
+        )
+        return paginator.get_cursor_page(cursor)
+    paginator = WindowedPaginator(
+        posts_list, settings.LIMITS_IN_PAGE, total or posts_list.count
+    )
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
     return page_obj
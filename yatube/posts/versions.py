@@ -0,0 +1,81 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.transaction import on_commit
+
+
+def version_key(kind, pk):
+    return f'version:{kind}:{pk}'
+
+
+def after_commit(func, *args):
+    """
+    Сбрасывает кэш сейчас и ещё раз после коммита открытой транзакции:
+    иначе страница, собранная другим запросом по ещё старым данным,
+    осталась бы в кэше под новой версией.
+    """
+    func(*args)
+    if connection.in_atomic_block:
+        on_commit(lambda: func(*args))
+
+
+_pending = threading.local()
+
+
+def pending_until_commit(flush):
+    """
+    Множество, общее для открытой транзакции: после её коммита flush
+    один раз получает всё собранное. Вне транзакции — None. Откат
+    снимает flush из on_commit, и следующий вызов заводит новое.
+    """
+    if not connection.in_atomic_block:
+        return None
+    batches = _pending.__dict__.setdefault('batches', {})
+    items, commit = batches.get(flush, (None, None))
+    if items is None or not any(
+        func is commit for _, func in connection.run_on_commit
+    ):
+        items = set()
+
+        def commit():
+            batches.pop(flush, None)
+            flush(items)
+
+        batches[flush] = items, commit
+        on_commit(commit)
+    return items
+
+
+def touch(*objects):
+    """Сразу меняет версии пар (kind, pk) одной записью в кэш."""
+    now = time.time_ns()
+    cache.set_many(
+        {version_key(kind, pk): now for kind, pk in objects}, None
+    )
+
+
+def bump(kind, pk):
+    """Делает недействительными все записи кэша, зависящие от объекта."""
+    after_commit(touch, (kind, pk))
+
+
+def versions(*objects):
+    """
+    Версии пар (kind, pk) — время последнего изменения в наносекундах.
+    Пропавшую из кэша версию заводим заново уникальным значением, чтобы
+    не вернуться к старым данным.
+    """
+    keys = [version_key(kind, pk) for kind, pk in objects]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def stamp(*objects):
+    """Общая метка версий для пар (kind, pk)."""
+    return '.'.join(str(version) for version in versions(*objects))
@@ -1,25 +1,79 @@
+from datetime import datetime
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import (
+    Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.ratelimit import rate_limit
+from core.replicas import read_replica
+
+from . import counters, export, follow_graph, live, writer
+from .cards import render_card
 from .forms import CommentForm, PostForm
+from .middleware import query_budget
 from .models import Follow, Group, Post, User
-from .utils import paginations
+from .page_cache import cache_anonymous_page, conditional_page, page_version
+from .search import search as search_posts
+from .timeline import FEED_FIELDS, feed
+from .utils import comment_page, decode_cursor, paginations
+
+
+def index_dependencies(request):
+    return [('index', '')]
+
+
+def group_dependencies(request, slug):
+    return [('group', slug)]
 
 
+def profile_dependencies(request, username):
+    objects = [('profile', username)]
+    if request.user.is_authenticated:
+        objects.append(('follows', request.user.pk))
+    return objects
+
+
+def post_dependencies(request, post_id):
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    if username is None:
+        return None
+    return [('post', post_id), ('profile', username)]
+
+
+@read_replica
+@query_budget(5)
+@conditional_page(index_dependencies)
+@cache_anonymous_page('index')
 def index(request):
     post_list = Post.objects.select_related(
         'author').select_related('group').all()
-    page_obj = paginations(request, post_list)
+    page_obj = paginations(request, post_list, total=lambda: (
+        counters.cached_count(
+            'index', '', Post.objects.all(), counters.largest_post_id
+        )
+    ))
     context = {
         'page_obj': page_obj,
+        'page_version': page_version('index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@read_replica
+@query_budget(6)
+@conditional_page(group_dependencies)
+@cache_anonymous_page('group', 'slug')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author').all()
-    page_obj = paginations(request, post_list)
+    page_obj = paginations(
+        request, post_list, total=lambda: group.posts_count
+    )
     context = {
         'page_obj': page_obj,
         'group': group
@@ -27,24 +81,54 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@read_replica
+@query_budget(10)
+@conditional_page(profile_dependencies)
+@cache_anonymous_page('profile', 'username')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counter'), username=username
+    )
     posts = author.posts.select_related('group')
-    page_obj = paginations(request, posts)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
+    counter = getattr(author, 'counter', None)
+    page_obj = paginations(
+        request, posts, total=lambda: counter.posts_count if counter else 0
+    )
+    following = request.user.is_authenticated and follow_graph.is_following(
+        request.user.pk, author.pk
+    )
+    graph = follow_graph.get(author.pk)
     context = {
         'page_obj': page_obj,
         'author': author,
         'following': following,
+        'followers_count': graph['followers'],
+        'following_count': len(graph['following']),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(3)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_posts(
+        query, request.GET.get('cursor'), settings.LIMITS_IN_PAGE
+    )
+    context = {
+        'page_obj': page_obj,
+        'q': query,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_replica
+@query_budget(6)
+@conditional_page(post_dependencies)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()  # Comment.objects.filter(post=post)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counter', 'group'), pk=post_id
+    )
+    comments = comment_page(post, request.GET.get('comments'))
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -54,7 +138,61 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(3)
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comment_page(post, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@query_budget(5)
+def new_posts(request):
+    """
+    Посты новее курсора since для живого обновления главной или ленты
+    подписок (feed=follow): карточками (по умолчанию) или JSON.
+    """
+    position = decode_cursor(request.GET.get('since'))
+    if position is None or not isinstance(position[1], datetime):
+        return JsonResponse({'error': 'Нужен курсор since'}, status=400)
+    user = None
+    if request.GET.get('feed') == live.FOLLOW:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Нужна авторизация'}, status=401)
+        user = request.user
+    _, date, pk = position
+    posts, more = live.new_posts(user, date, pk, settings.LIMITS_IN_PAGE)
+    data = {
+        'count': len(posts),
+        'more': more,
+        'since': (
+            live.since_token(posts[0]) if posts else request.GET['since']
+        ),
+    }
+    if request.GET.get('format') == 'json':
+        data['posts'] = [
+            {
+                'id': post.pk,
+                'text': post.text,
+                'pub_date': post.pub_date.isoformat(),
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+            }
+            for post in posts
+        ]
+    else:
+        data['html'] = ''.join(
+            render_card(post) + '<hr>' for post in posts
+        )
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@query_budget(14)
 @login_required
+@rate_limit('post_create', methods=('POST',))
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -63,7 +201,7 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        writer.write(post.save)
         return redirect('posts:profile', request.user)
     context = {
         'form': form,
@@ -71,6 +209,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(14)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -87,7 +226,9 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', {'form': form, })
 
 
+@query_budget(10)
 @login_required
+@rate_limit('add_comment', methods=('POST',))
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -95,37 +236,40 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        writer.write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_replica
+@query_budget(8)
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
-    page_obj = paginations(request, post_list)
+    post_list = feed(request.user).select_related('author', 'group')
+    page_obj = paginations(
+        request, post_list, FEED_FIELDS, total=lambda: counters.cached_count(
+            'follow', request.user.pk, post_list
+        )
+    )
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(10)
 @login_required
+@rate_limit('profile_follow')
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    is_following_already = Follow.objects.filter(
-        user=user, author=author
-    ).exists()
-    if user != author and not is_following_already:
-        Follow.objects.create(
-            user=user,
-            author=author,
+    if user != author:
+        writer.write(
+            Follow.objects.get_or_create, user=user, author=author
         )
     return redirect('posts:profile', username=username)
 
 
+@query_budget(9)
 @login_required
 def profile_unfollow(request, username):
     user = request.user
@@ -134,3 +278,28 @@ def profile_unfollow(request, username):
         user=user, author=author
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+@query_budget(3)
+@login_required
+def export_posts(request, file_format):
+    """Потоковая выгрузка постов с фильтрами из параметров запроса."""
+    if file_format not in export.FORMATS:
+        raise Http404
+    try:
+        posts = export.posts(
+            author=request.GET.get('author'),
+            group=request.GET.get('group'),
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        export.stream(posts, file_format),
+        content_type=export.FORMATS[file_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="posts.{file_format}"'
+    )
+    return response
@@ -0,0 +1,142 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from core.replicas import pin_to_primary
+
+from .middleware import active_counters, counting
+
+logger = logging.getLogger(__name__)
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+class WriteCoordinator:
+    """
+    Единственный поток-писатель процесса. Запросы ставят функции записи
+    в очередь и ждут результата; писатель берёт всё, что пришло за
+    окно window секунд (не больше batch_size), выполняет каждую функцию
+    в своей точке сохранения и коммитит пачку одной транзакцией: один
+    fsync на пачку вместо одного на запрос. Результат и исключение
+    возвращаются запросу только после коммита.
+    """
+
+    def __init__(self, window, batch_size):
+        self.window = window
+        self.batch_size = batch_size
+        self.pid = os.getpid()
+        self.batches = self.writes = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(
+            target=self.run, name='write-coordinator', daemon=True
+        )
+        self.thread.start()
+
+    def enqueue(self, func, *args, **kwargs):
+        future = Future()
+        self.queue.put((future, func, args, kwargs))
+        return future
+
+    def submit(self, func, *args, **kwargs):
+        return self.enqueue(func, *args, **kwargs).result()
+
+    def collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get(
+                    timeout=max(0, deadline - time.monotonic())
+                ))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            self.commit(self.collect())
+
+    def commit(self, batch):
+        outcomes = []
+        try:
+            close_old_connections()
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic():
+                            result = func(*args, **kwargs)
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+                    else:
+                        outcomes.append((future, result, None))
+        except Exception as error:
+            for future, *_ in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def coordinator():
+    global _coordinator
+    # После fork поток родителя в дочернем процессе не работает.
+    if _coordinator is None or _coordinator.pid != os.getpid():
+        with _coordinator_lock:
+            if _coordinator is None or _coordinator.pid != os.getpid():
+                _coordinator = WriteCoordinator(
+                    settings.WRITE_BATCH_WINDOW, settings.WRITE_BATCH_SIZE
+                )
+    return _coordinator
+
+
+def counted(counters, func, *args, **kwargs):
+    with counting(*counters):
+        return func(*args, **kwargs)
+
+
+def write(func, *args, **kwargs):
+    """
+    Выполняет запись через писателя процесса и возвращает её результат.
+    Внутри уже открытой транзакции запись идёт в ней же: иначе
+    вызывающий не увидел бы её до своего коммита. Запросы писателя
+    попадают в счётчики бюджета вызывающего запроса.
+    """
+    if not settings.WRITE_COORDINATOR or connection.in_atomic_block:
+        return func(*args, **kwargs)
+    try:
+        return coordinator().submit(
+            counted, active_counters(), func, *args, **kwargs
+        )
+    finally:
+        pin_to_primary()
+
+
+def log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Deferred write failed', exc_info=error)
+
+
+def defer(func, *args, **kwargs):
+    """
+    Ставит запись в очередь писателя и не ждёт её: для фоновой работы,
+    которую не должен оплачивать запрос. Без писателя выполняет сразу.
+    """
+    if not settings.WRITE_COORDINATOR:
+        func(*args, **kwargs)
+        return
+    coordinator().enqueue(func, *args, **kwargs).add_done_callback(
+        log_failure
+    )
@@ -31,12 +31,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -63,12 +65,55 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# Соединения живут CONN_MAX_AGE секунд и получают PRAGMA при открытии:
+# WAL не блокирует чтение записью, synchronous=NORMAL в WAL теряет при
+# сбое питания только последние транзакции, но не портит базу.
+SQLITE_OPTIONS = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'pragmas': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+    },
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': SQLITE_OPTIONS,
+    },
+    # Копия default только для чтения, обновляется командой sync_replicas.
+    'replica': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': SQLITE_OPTIONS,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Записи комментариев, подписок и постов коммитятся пачками из потока
+# posts.writer: до WRITE_BATCH_SIZE записей, пришедших за окно в секундах.
+# При нулевом окне пачка — всё, что накопилось за время прошлого коммита.
+WRITE_COORDINATOR = True
+WRITE_BATCH_WINDOW = 0
+WRITE_BATCH_SIZE = 64
+
+# Токен-бакеты core.ratelimit: имя -> (запросов подряд, за сколько
+# секунд бакет наполняется заново). Считаются на пользователя или IP.
+RATE_LIMITS = {
+    'post_create': (10, 60),
+    'add_comment': (20, 60),
+    'profile_follow': (30, 60),
+    'signup': (5, 60 * 60),
 }
+# Реплики, с которых читают страницы; пусто — всё читается из default.
+DATABASE_REPLICAS = ()
+REPLICA_PIN_SECONDS = 10
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -98,6 +143,21 @@ USE_L10N = True
 USE_TZ = True
 
 LIMITS_IN_PAGE = 10
+COMMENTS_IN_PAGE = 20
+FEED_ITEMS = 20
+CURSOR_PAGINATION = False
+# Сколько соседних номеров страниц показывать с каждой стороны.
+PAGINATION_WINDOW = 3
+PAGE_COUNT_REFRESH = 60
+PAGE_COUNT_TIMEOUT = 60 * 60 * 24
+PAGE_COUNT_WORKERS = 1
+TIMELINE_FANOUT_LIMIT = 1000
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+POST_CARD_TIMEOUT = 60 * 60 * 24
+PAGE_CACHE_TIMEOUT = 60 * 5
+QUERY_BUDGET_STRICT = DEBUG
+# Хранилище sorl-thumbnail кэшируется отдельно и прогревается заранее.
+QUERY_BUDGET_IGNORED_TABLES = ('thumbnail_kvstore',)
 POST_SYMBOLS = 15
 
 STATIC_URL = '/static/'
@@ -112,8 +172,23 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Должны совпадать с тегами {% thumbnail %} в шаблонах постов.
+THUMBNAIL_PRESETS = (
+    ('500x339', {'crop': 'center', 'upscale': True}),
+    ('600x339', {'crop': 'center', 'upscale': True}),
+)
+THUMBNAIL_WORKERS = 2
+
+# LRU в памяти воркера перед общим для всех воркеров файлом SQLite.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'LOCAL_MAX_ENTRIES': 2000,
+            'SYNC_INTERVAL': 0.25,
+        },
     }
 }
+TEST_RUNNER = 'core.runner.TestRunner'